@@ -1,19 +1,33 @@
+#include <util/crc16.h>
+
 #define NUM_BUTTONS 10
+#define NUM_AXES 6
+
+// Set to 1 to print the old ASCII CSV line instead of binary frames
+#define LEGACY_CSV 0
 
-const int buttonPins[NUM_BUTTONS] = {2, 3, 4, 5, 6, 7, 8, 9, 10, 11}; 
-const int joystickPins[6] = {A0, A1, A2, A3, A4, A5}; 
-bool buttonStates[NUM_BUTTONS]; 
+// Frame layout (little endian, 19 bytes), decoded by src/surface_package/protocol.py:
+// sync (0xA5 0x5A), seq (u8), 6 x axis (u16), buttons bitmask (u16), crc16 (u16)
+#define FRAME_SIZE 19
+#define SYNC_0 0xA5
+#define SYNC_1 0x5A
+
+const int buttonPins[NUM_BUTTONS] = {2, 3, 4, 5, 6, 7, 8, 9, 10, 11};
+const int joystickPins[NUM_AXES] = {A0, A1, A2, A3, A4, A5};
+bool buttonStates[NUM_BUTTONS];
+uint8_t seq = 0;
 
 void setup() {
-  Serial.begin(9600); 
+  // Matches arduino_baudrate in configs/surface_station.yml
+  Serial.begin(115200);
   for (int i = 0; i < NUM_BUTTONS; i++) {
-    pinMode(buttonPins[i], INPUT_PULLUP); 
+    pinMode(buttonPins[i], INPUT_PULLUP);
   }
 }
 
 void loop() {
-  int joystickValues[6];
-  for (int i = 0; i < 6; i++) {
+  int joystickValues[NUM_AXES];
+  for (int i = 0; i < NUM_AXES; i++) {
     joystickValues[i] = analogRead(joystickPins[i]);
   }
 
@@ -21,16 +35,53 @@ void loop() {
     buttonStates[i] = digitalRead(buttonPins[i]);
   }
 
+#if LEGACY_CSV
   sendValues(joystickValues, buttonStates);
-  delay(10); 
+#else
+  sendFrame(joystickValues, buttonStates);
+#endif
+  delay(10);
+}
+
+void sendFrame(int joystickValues[], bool buttonStates[]) {
+  uint8_t frame[FRAME_SIZE];
+  uint8_t n = 0;
+  frame[n++] = SYNC_0;
+  frame[n++] = SYNC_1;
+  frame[n++] = seq++;
+
+  for (int i = 0; i < NUM_AXES; i++) {
+    frame[n++] = joystickValues[i] & 0xFF;
+    frame[n++] = (joystickValues[i] >> 8) & 0xFF;
+  }
+
+  // Buttons use INPUT_PULLUP, so LOW means pressed
+  uint16_t buttons = 0;
+  for (int i = 0; i < NUM_BUTTONS; i++) {
+    if (buttonStates[i] == LOW) {
+      buttons |= (1 << i);
+    }
+  }
+  frame[n++] = buttons & 0xFF;
+  frame[n++] = (buttons >> 8) & 0xFF;
+
+  // CRC covers everything after the sync word
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 2; i < n; i++) {
+    crc = _crc_ccitt_update(crc, frame[i]);
+  }
+  frame[n++] = crc & 0xFF;
+  frame[n++] = (crc >> 8) & 0xFF;
+
+  Serial.write(frame, FRAME_SIZE);
 }
 
 void sendValues(int joystickValues[], bool buttonStates[]) {
-  for (int i = 0; i < 6; i++) {
+  for (int i = 0; i < NUM_AXES; i++) {
     Serial.print(joystickValues[i]);
     Serial.print(",");
   }
-  
+
   for (int i = 0; i < NUM_BUTTONS; i++) {
     Serial.print(buttonStates[i] == HIGH ? "False" : "True");
     if (i < NUM_BUTTONS - 1) {
@@ -0,0 +1,40 @@
+# Per-sample cost of the thruster mixer, one sample at a time and in batches
+#
+# Run from the repository root:
+#   python benchmarks/bench_mixer.py
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from movement_package.mixer import Mixer
+
+BATCHES = (1, 10, 100, 1000, 10000)
+
+
+def main():
+    mixer = Mixer(deadband=0.05, expo=0.3, trims=[5, -5, 0, 0, 0, 0, 10, -10])
+    rng = np.random.default_rng(0)
+    print('{:>8}{:>16}'.format('batch', 'us per sample'))
+    for batch in BATCHES:
+        axes = rng.integers(0, 1024, size=(batch, 6)).astype(np.uint16)
+        buttons = rng.integers(0, 1024, size=batch).astype(np.uint16)
+        if batch == 1:
+            axes, buttons = axes[0], buttons[0]
+        number = max(10, 20000 // batch)
+        best = min(timeit.repeat(lambda: mixer.mix(axes, buttons), number=number, repeat=5)) / number
+        print('{:>8}{:>16.3f}'.format(batch, best / batch * 1e6))
+
+    # The uplink path: one STATE_DTYPE record in, PWM lists out
+    sample = np.zeros(1, dtype=[('axes', '<u2', (6,)), ('buttons', '<u2')])[0]
+    sample['axes'] = [600, 400, 512, 512, 700, 300]
+    best = min(timeit.repeat(lambda: mixer(sample), number=20000, repeat=5)) / 20000
+    print('{:>8}{:>16.3f}'.format('uplink', best * 1e6))
+
+
+if __name__ == '__main__':
+    main()
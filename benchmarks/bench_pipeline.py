@@ -0,0 +1,234 @@
+# End to end pipeline benchmark
+#
+# Drives the whole station with simulated devices, the same way it runs on the bench:
+#   FakeArduino (pty, AUV.ino frames) -> SerialReader / FrameDecoder ("serial")
+#   -> CommandUplink tick: newest sample, mixer, UDP send ("command")
+#   -> OrinSimulator on loopback, which streams telemetry back
+#   -> TelemetryReceiver batches ("telemetry") -> StationCore.poll ("display")
+# Per stage timings come from the station's own instrumentation (surface_package/instrument.py),
+# so the numbers here are the ones the stats log line shows at runtime. On top of that it
+# measures joystick write to Orin receive latency, throughput, CPU per stage, and in a second
+# pass with tracemalloc (which slows everything down) the memory each stage's modules retained.
+#
+# Results are written as JSON. Pass --baseline with an earlier result to flag stages whose
+# p99 got worse by more than --tolerance; the exit status is 1 if any did.
+#
+# Run from the repository root:
+#   python benchmarks/bench_pipeline.py [--duration 5] [--json benchmarks/results/pipeline.json]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from surface_package.arduino_sim import FakeArduino
+from surface_package.config import load_config
+from surface_package.instrument import HISTOGRAM_EDGES_US, Instruments, StageTimer
+from surface_package.orin_sim import OrinSimulator
+from surface_package.station import StationCore
+from surface_package.uplink import KIND_CONTROL
+
+# Which stage the memory allocated in each module is charged to
+STAGE_MODULES = {
+    'protocol.py': 'serial',
+    'serial_reader.py': 'serial',
+    'uplink.py': 'command',
+    'mixer.py': 'command',
+    'telemetry.py': 'telemetry',
+    'station.py': 'display',
+    'link_monitor.py': 'link',
+}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def stage_result(timer):
+    result = timer.stats()
+    result['histogram_us'] = {'edges': HISTOGRAM_EDGES_US.tolist(), 'counts': timer.histogram().tolist()}
+    return result
+
+
+def run_pipeline(args, tmp, trace=False):
+    arduino = FakeArduino(os.path.join(tmp, 'ttyACM0'))
+    with OrinSimulator(rate=args.telemetry_rate, batch_rate=100.0, watchdog_timeout=1.0) as orin:
+        config = load_config(os.path.join(ROOT, 'configs', 'surface_station.yml')).replace(
+            serial=True, arduino_serial_port=arduino.link, arduino_sample_rate=1000.0,
+            orin_ip_address='127.0.0.1', command_port=orin.command_port, command_rate=args.command_rate,
+            telemetry_port=orin.telemetry_port, heartbeat_port=orin.heartbeat_port,
+            record=False, instrument=True, stats_interval=3600.0)
+        count = int(args.duration * args.joystick_rate)
+        core = StationCore(config=config, instruments=Instruments(capacity=max(4096, 2 * count)))
+        core.start()
+        assert wait_for(lambda: core.serial_reader.connected), 'serial reader did not connect'
+        core.connect_orin('127.0.0.1')
+        assert wait_for(lambda: core.telemetry.connected), 'telemetry did not connect'
+        core.start_sub('127.0.0.1')
+
+        # Axes 0 and 1 carry a counter so every command can be matched to the write it came from
+        written = np.zeros(count)
+        stop = threading.Event()
+
+        def joystick():
+            period = 1.0 / args.joystick_rate
+            next_write = time.monotonic()
+            for i in range(count):
+                if stop.is_set():
+                    break
+                written[i] = time.monotonic()
+                arduino.send([i % 1024, i // 1024, 512, 512, 512, 512], 0)
+                next_write += period
+                delay = next_write - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+        if trace:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        writer = threading.Thread(target=joystick, name='fake_joystick')
+        writer.start()
+        display_period = 1.0 / config.gui_fps
+        while writer.is_alive():
+            core.poll()
+            time.sleep(display_period)
+        time.sleep(0.1)
+        elapsed = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+        if trace:
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        stats = core.stats()
+        core.shutdown()
+        log = orin.commands_logged()
+    arduino.unplug()
+
+    if trace:
+        retained = {}
+        for diff in after.compare_to(before, 'filename'):
+            stage = STAGE_MODULES.get(os.path.basename(diff.traceback[0].filename))
+            if stage is None:
+                continue
+            entry = retained.setdefault(stage, {'bytes': 0, 'blocks': 0})
+            entry['bytes'] += diff.size_diff
+            entry['blocks'] += diff.count_diff
+        return retained
+
+    log = log[log['kind'] == KIND_CONTROL]
+    values = log['axes'][:, 0].astype(np.int64) + 1024 * log['axes'][:, 1].astype(np.int64)
+    values, first = np.unique(values, return_index=True)
+    keep = values < count
+    end_to_end = StageTimer('joystick_to_orin', capacity=max(1, int(keep.sum())))
+    for latency in log['recv_time'][first[keep]] - written[values[keep]]:
+        end_to_end.add(float(latency))
+
+    stages = {name: stage_result(timer) for name, timer in core.instruments.stages.items()}
+    stages['joystick_to_orin'] = stage_result(end_to_end)
+    return {
+        'elapsed_s': elapsed,
+        'throughput': {
+            'joystick_frames_per_s': stats['serial']['frames'] / elapsed,
+            'commands_per_s': len(log) / elapsed,
+            'telemetry_records_per_s': stats['telemetry']['records'] / elapsed,
+            'display_polls_per_s': core.instruments.stages['display'].count / elapsed,
+        },
+        'errors': {
+            'frames_lost': stats['serial']['lost'],
+            'crc_errors': stats['serial']['crc_errors'],
+            'missed_ticks': stats['uplink']['missed_ticks'],
+            'telemetry_errors': stats['telemetry']['errors'],
+        },
+        'cpu': {
+            'process_ms': cpu * 1000,
+            'process_percent': cpu / elapsed * 100,
+            'stages_ms': {name: timer.cpu * 1000 for name, timer in core.instruments.stages.items() if timer.cpu},
+        },
+        'stages': stages,
+    }
+
+
+def compare(result, baseline, tolerance):
+    # Stages whose p99 grew by more than tolerance (a fraction) over the baseline
+    regressions = []
+    for name, stage in result['stages'].items():
+        old = baseline.get('stages', {}).get(name)
+        if not old or not old.get('count') or not stage.get('count'):
+            continue
+        if stage['p99_us'] > old['p99_us'] * (1.0 + tolerance):
+            regressions.append((name, old['p99_us'], stage['p99_us']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End to end surface station pipeline benchmark')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of joystick input per pass')
+    parser.add_argument('--joystick-rate', type=float, default=500.0, help='frames per second from the fake Arduino')
+    parser.add_argument('--command-rate', type=float, default=100.0, help='uplink ticks per second')
+    parser.add_argument('--telemetry-rate', type=float, default=1000.0, help='telemetry records per second from the Orin')
+    parser.add_argument('--json', default=os.path.join(ROOT, 'benchmarks', 'results', 'pipeline.json'))
+    parser.add_argument('--baseline', help='earlier JSON result to compare p99 latencies against')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed p99 growth over the baseline')
+    parser.add_argument('--no-allocations', action='store_true', help='skip the tracemalloc pass')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result = run_pipeline(args, tmp)
+        if not args.no_allocations:
+            result['retained_memory'] = run_pipeline(args, tmp, trace=True)
+    result['meta'] = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'args': vars(args),
+    }
+
+    print('{:<18}{:>9}{:>11}{:>11}{:>11}{:>11}{:>10}'.format('stage', 'count', 'p50 us', 'p90 us', 'p99 us',
+                                                              'max us', 'cpu ms'))
+    for name, stage in result['stages'].items():
+        if not stage['count']:
+            continue
+        print('{:<18}{:>9}{:>11.1f}{:>11.1f}{:>11.1f}{:>11.1f}{:>10.1f}'.format(
+            name, stage['count'], stage['p50_us'], stage['p90_us'], stage['p99_us'], stage['max_us'],
+            stage.get('cpu_ms', 0.0)))
+    print('throughput: ' + ', '.join('{} {:.1f}'.format(k, v) for k, v in result['throughput'].items()))
+    print('errors: ' + ', '.join('{} {}'.format(k, v) for k, v in result['errors'].items()))
+    print('process cpu: {:.1f}%'.format(result['cpu']['process_percent']))
+    if 'retained_memory' in result:
+        print('retained memory: ' + ', '.join('{} {} B / {} blocks'.format(k, v['bytes'], v['blocks'])
+                                             for k, v in result['retained_memory'].items()))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+    with open(args.json, 'w') as f:
+        json.dump(result, f, indent=2)
+    print('results written to {}'.format(args.json))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print('REGRESSION {}: p99 {:.1f} us -> {:.1f} us'.format(name, old, new))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Redraw cost per frame of the rolling telemetry plots
+#
+# For each window length and sample rate the buffer is filled with a full window of
+# telemetry-like data, then every frame appends one GUI frame's worth of new samples and
+# redraws. "blit" is RollingPlot as the GUI uses it (min/max decimation, blitted lines),
+# "full" is the naive approach for comparison: every sample handed to the lines and the
+# whole figure redrawn. Rendering is off screen with Agg, so no display is needed.
+#
+# Run from the repository root:
+#   python benchmarks/bench_plots.py [frames]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from surface_package.plots import RollingPlot
+
+WINDOWS = (10.0, 60.0, 120.0)
+RATES = (100.0, 1000.0, 2000.0)
+GUI_FPS = 15.0
+CHANNELS = 12
+
+
+def signals(t):
+    # Slow sinusoids plus sensor noise, one row per channel
+    phase = np.arange(CHANNELS)[:, None]
+    y = 20.0 * np.sin(t[None, :] / 3.0 + phase) + np.random.default_rng(0).normal(0.0, 0.5, (CHANNELS, len(t)))
+    y[4:] = 1500.0 + 10.0 * y[4:]
+    return y.astype(np.float32)
+
+
+def bench(window, rate, frames, full):
+    plot = RollingPlot(window=window, rate=rate, columns=3)
+    plot.figure.set_size_inches(12.8, 1.7)
+    n = int(window * rate)
+    t = np.arange(n) / rate
+    plot.append(t, signals(t))
+    step = max(1, int(rate / GUI_FPS))
+    plot.draw()
+    canvas = plot.figure.canvas
+    times = []
+    for i in range(frames):
+        t = (n + i * step + np.arange(step)) / rate
+        y = signals(t)
+        start = time.perf_counter()
+        plot.append(t, y)
+        if full:
+            bt, by = plot.buffer.window(window)
+            x = bt - bt[-1]
+            for lines, columns in zip(plot.lines, plot.columns):
+                for line, row in zip(lines, by[columns]):
+                    line.set_animated(False)
+                    line.set_data(x, row)
+            canvas.draw()
+        else:
+            plot.draw()
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000, plot.stats()
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    print('{:>8}{:>8}{:>10}{:>8}{:>12}{:>12}{:>12}'.format('window', 'rate', 'samples', 'points',
+                                                           'blit ms', 'blit p99', 'full ms'))
+    for window in WINDOWS:
+        for rate in RATES:
+            blit, stats = bench(window, rate, frames, full=False)
+            full, _ = bench(window, rate, max(3, frames // 10), full=True)
+            print('{:>8.0f}{:>8.0f}{:>10d}{:>8d}{:>12.2f}{:>12.2f}{:>12.1f}'.format(
+                window, rate, int(window * rate), stats['points'], blit.mean(),
+                np.percentile(blit, 99), full.mean()))
+
+
+if __name__ == '__main__':
+    main()
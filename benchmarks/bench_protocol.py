@@ -0,0 +1,85 @@
+# Compare the legacy CSV parser with the binary frame decoder
+#
+# Run from the repository root:
+#   python benchmarks/bench_protocol.py
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from surface_package.controller import new_controller, apply_sample
+from surface_package.protocol import FRAME_SIZE, SAMPLE_DTYPE, FrameDecoder, encode_frames, encode_legacy_line
+
+SAMPLES = 20000
+# Bytes handed to the decoder per serial read
+CHUNKS = (64, 4096)
+BAUD_RATES = (9600, 115200)
+
+
+# The parser src/main.py used before the binary frames, kept here as the baseline
+def legacy_update_controller(data, controller):
+    values = data.split(',')
+    controller.left.x_axis = float(values[0])
+    controller.left.y_axis = float(values[1])
+    controller.left.z_axis = float(values[2])
+    controller.right.x_axis = float(values[3])
+    controller.right.y_axis = float(values[4])
+    controller.right.z_axis = float(values[5])
+    for i, val in enumerate(values[6:]):
+        controller.buttons["button" + str(i + 1)] = val == 'True'
+
+
+def make_samples(n):
+    rng = np.random.default_rng(0)
+    samples = np.zeros(n, dtype=SAMPLE_DTYPE)
+    samples['seq'] = np.arange(n) % 256
+    samples['axes'] = rng.integers(0, 1024, size=(n, 6))
+    samples['buttons'] = rng.integers(0, 1024, size=n)
+    return samples
+
+
+def bench_legacy(samples):
+    lines = [encode_legacy_line(s['axes'].tolist(), int(s['buttons'])) for s in samples]
+    controller = new_controller()
+    start = time.perf_counter()
+    for line in lines:
+        legacy_update_controller(line.decode('utf-8').rstrip(), controller)
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(len(line) for line in lines) / len(lines)
+
+
+def bench_binary(samples, chunk):
+    data = encode_frames(samples)
+    chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)]
+    decoder = FrameDecoder(mode='binary')
+    controller = new_controller()
+    start = time.perf_counter()
+    for chunk in chunks:
+        out = decoder.feed(chunk)
+        if len(out):
+            latest = out[-1]
+            apply_sample(controller, latest['axes'], latest['buttons'])
+    elapsed = time.perf_counter() - start
+    assert decoder.frames == len(samples)
+    return elapsed, FRAME_SIZE
+
+
+def main():
+    samples = make_samples(SAMPLES)
+    results = {'legacy csv': bench_legacy(samples)}
+    for chunk in CHUNKS:
+        results['binary/{}'.format(chunk)] = bench_binary(samples, chunk)
+    print('{:<14}{:>14}{:>14}'.format('format', 'decode/s', 'bytes/sample') +
+          ''.join('{:>14}'.format('Hz @ {}'.format(b)) for b in BAUD_RATES))
+    for name, (elapsed, size) in results.items():
+        # 8N1 serial sends 10 bits per byte
+        rates = ''.join('{:>14.1f}'.format(baud / 10 / size) for baud in BAUD_RATES)
+        print('{:<14}{:>14.0f}{:>14.1f}{}'.format(name, SAMPLES / elapsed, size, rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Flight recorder append cost, and open/seek/replay cost of a long recording
+#
+# Run from the repository root:
+#   python benchmarks/bench_recorder.py [minutes of 1 kHz telemetry, default 10]
+
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from surface_package.orin_sim import make_telemetry
+from surface_package.recorder import Player, Recorder, Recording
+from surface_package.serial_reader import STATE_DTYPE
+from surface_package.telemetry import TELEMETRY_DTYPE
+
+RATE = 1000.0
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def bench_append(tmp):
+    recorder = Recorder(tmp, name='append')
+    controller = recorder.stream('controller', STATE_DTYPE)
+    sample = np.zeros(1, dtype=STATE_DTYPE)
+    single = min(timeit.repeat(lambda: controller.append(sample), number=10000, repeat=3)) / 10000
+    telemetry = recorder.stream('telemetry', TELEMETRY_DTYPE)
+    batch = make_telemetry(0, 10, time.time(), RATE)
+    batched = min(timeit.repeat(lambda: telemetry.append(batch), number=2000, repeat=3)) / 2000 / 10
+    recorder.close()
+    print('append 1 record:          {:8.2f} us'.format(single * 1e6))
+    print('append per record (x10):  {:8.2f} us'.format(batched * 1e6))
+    print('budget at 1 kHz:          {:8.2f} % of one core'.format(single * RATE * 100))
+
+
+def bench_long(tmp, minutes):
+    count = int(minutes * 60 * RATE)
+    recorder = Recorder(tmp, name='long')
+    writer = recorder.stream('telemetry', TELEMETRY_DTYPE)
+    t0 = 1.7e9
+    start = time.perf_counter()
+    for i in range(0, count, 1000):
+        records = make_telemetry(i, 1000, t0 + i / RATE, RATE)
+        writer.append(records, t=t0 + i / RATE)
+    recorder.close()
+    print('wrote {} records ({:.0f} MiB) in {:.2f} s'.format(
+        count, count * writer.dtype.itemsize / 2 ** 20, time.perf_counter() - start))
+
+    before = rss_mb()
+    start = time.perf_counter()
+    recording = Recording(recorder.path)
+    stream = recording['telemetry']
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    middle = stream.seek(t0 + count / RATE / 2)
+    window = stream.read(middle, middle + int(RATE))
+    seeked = time.perf_counter() - start
+    print('open {:.2f} ms, seek + read 1 s {:.2f} ms, RSS +{:.1f} MiB'.format(
+        opened * 1e3, seeked * 1e3, rss_mb() - before))
+    assert len(window) == int(RATE)
+
+    player = Player(recording, {'telemetry': lambda records: None}, speed=None)
+    start = time.perf_counter()
+    player.run()
+    elapsed = time.perf_counter() - start
+    print('max speed replay {:.0f} records/s ({:.0f}x real time)'.format(count / elapsed, count / RATE / elapsed))
+
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_append(tmp)
+        bench_long(tmp, minutes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# Cold start to "ready to send commands"
+#
+# Every run is a fresh interpreter, timed from process start until the station is ready:
+#   headless core     StationCore.start() has returned (config loaded, mixer tables built,
+#                     uplink socket open)
+#   GUI station       the same plus the surfaceStation window built, which since the rolling
+#                     plots were added also imports matplotlib
+#   baseline station  what src/main.py did before the core was split out: import PySimpleGUI,
+#                     numpysocket, pyserial and yaml, load the config, block on readline()
+#                     for the first controller line, then build and finalize the window
+# The baseline reads from a FakeArduino pty that streams legacy CSV lines at 100 Hz,
+# like AUV.ino did. Variants whose toolkit is not installed, or that need a display when
+# there is none, are reported as n/a with the reason.
+#
+# Run from the repository root:
+#   python benchmarks/bench_startup.py [runs]
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARDUINO = '''
+import os, tempfile, threading
+from surface_package.arduino_sim import FakeArduino
+arduino = FakeArduino(os.path.join(tempfile.mkdtemp(), 'ttyACM0'))
+def stream():
+    line = b'512,512,512,512,512,512,' + b','.join([b'False'] * 10) + b'\\n'
+    while True:
+        arduino.write(line)
+        time.sleep(0.01)
+threading.Thread(target=stream, daemon=True).start()
+'''
+
+HEADLESS = '''
+import sys, time
+sys.path.insert(0, 'src')
+from surface_package.config import load_config
+from surface_package.station import StationCore
+config = load_config('configs/surface_station.yml').replace(serial=False, record=False, orin_ip_address='127.0.0.1')
+core = StationCore(config=config).start()
+ready = time.perf_counter()
+core.shutdown()
+print(ready)
+'''
+
+GUI = '''
+import sys, time
+sys.path.insert(0, 'src')
+from surface_package.config import load_config
+from surface_package.station import StationCore
+from main import surfaceStation
+config = load_config('configs/surface_station.yml').replace(serial=False, record=False, orin_ip_address='127.0.0.1')
+core = StationCore(config=config).start()
+view = surfaceStation(core)
+ready = time.perf_counter()
+view.window.close()
+core.shutdown()
+print(ready)
+'''
+
+BASELINE = '''
+import sys, time
+sys.path.insert(0, 'src')
+import PySimpleGUI as sg
+import numpy as np
+from numpysocket import NumpySocket
+import serial
+import yaml
+''' + ARDUINO + '''
+with open('configs/surface_station.yml', 'r') as f:
+    config = yaml.load(f, Loader=yaml.FullLoader)
+ser = serial.Serial(arduino.link, config['arduino_baudrate'], timeout=config['arduino_timeout'])
+joystick = ser.readline().decode('utf-8').strip().split(',')
+sg.theme('DarkAmber')
+title_size = (25, 1)
+label_size = (20, 1)
+data_label_size = (17, 1)
+data_size = (10, 1)
+font_size = 12
+class Station:
+    pass
+self = Station()
+self.config = config
+with open('layouts/surface_station.txt') as f:
+    layout = eval(f.read())
+window = sg.Window('Surface Station', layout, size=(1920, 1080), element_justification='c', finalize=True)
+ready = time.perf_counter()
+window.close()
+ser.close()
+arduino.unplug()
+print(ready)
+'''
+
+VARIANTS = (
+    ('headless core', HEADLESS),
+    ('GUI station', GUI),
+    ('baseline station', BASELINE),
+)
+
+
+def time_start(script):
+    # perf_counter is CLOCK_MONOTONIC on Linux, so the child's value is comparable to ours.
+    # Returns (seconds, None) or (None, reason)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return None, lines[-1] if lines else 'exit status {}'.format(result.returncode)
+    return float(result.stdout.strip().splitlines()[-1]) - start, None
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for name, script in VARIANTS:
+        times = []
+        reason = None
+        for _ in range(runs):
+            elapsed, reason = time_start(script)
+            if elapsed is None:
+                break
+            times.append(elapsed)
+        if reason is not None:
+            print('{:<20} n/a ({})'.format(name, reason))
+            continue
+        times = np.array(times) * 1000
+        print('{:<20} p50 {:7.1f} ms  min {:7.1f} ms  max {:7.1f} ms'.format(
+            name, np.percentile(times, 50), times.min(), times.max()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Telemetry throughput and latency over loopback against the Orin simulator
+#
+# Run from the repository root:
+#   python benchmarks/bench_telemetry.py [seconds per rate]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from surface_package.orin_sim import OrinSimulator
+from surface_package.telemetry import TELEMETRY_DTYPE, TelemetryReceiver
+
+RATES = (100.0, 1000.0, 10000.0)
+
+
+def bench_rate(rate, duration):
+    with OrinSimulator(rate=rate) as orin:
+        receiver = TelemetryReceiver('127.0.0.1', orin.telemetry_port)
+        receiver.start()
+        deadline = time.monotonic() + 2.0
+        while not receiver.connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        start_count = receiver.ring.count
+        start = time.perf_counter()
+        time.sleep(duration)
+        elapsed = time.perf_counter() - start
+        received = receiver.ring.count - start_count
+        stats = receiver.stats()
+        receiver.stop()
+    return received / elapsed, stats
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    print('{:>10}{:>14}{:>12}{:>14}{:>14}'.format('rate Hz', 'received/s', 'KiB/s', 'p50 ms', 'p99 ms'))
+    for rate in RATES:
+        received, stats = bench_rate(rate, duration)
+        print('{:>10.0f}{:>14.1f}{:>12.1f}{:>14.3f}{:>14.3f}'.format(
+            rate, received, received * TELEMETRY_DTYPE.itemsize / 1024,
+            stats['latency_p50_ms'], stats['latency_p99_ms']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# End-to-end joystick to command latency
+#
+# A fake Arduino on a pty sends a new joystick value every 10 ms (like AUV.ino), the serial
+# reader publishes it, the uplink sends it on its next tick and the Orin simulator logs when
+# it arrived. Latency is measured from the pty write to the first command carrying the value.
+#
+# Run from the repository root:
+#   python benchmarks/bench_uplink.py [seconds per rate]
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from surface_package.arduino_sim import FakeArduino
+from surface_package.orin_sim import OrinSimulator
+from surface_package.serial_reader import SerialReader
+from surface_package.uplink import KIND_CONTROL, CommandUplink
+
+JOYSTICK_PERIOD = 0.01
+TICK_RATES = (50.0, 100.0, 200.0)
+
+
+def bench_rate(rate, duration, link):
+    arduino = FakeArduino(link)
+    reader = SerialReader(link, 115200, timeout=0.01, sample_rate=1000.0)
+    with OrinSimulator(watchdog_timeout=1.0) as orin:
+        uplink = CommandUplink('127.0.0.1', orin.command_port, state=reader.state, rate=rate)
+        reader.start()
+        while not reader.connected:
+            time.sleep(0.01)
+        uplink.start_sub()
+
+        # Axis 0 carries a counter so each command can be matched to the write that produced it
+        count = int(duration / JOYSTICK_PERIOD)
+        written = np.zeros(count)
+        next_write = time.monotonic()
+        for i in range(count):
+            written[i] = time.monotonic()
+            arduino.send([i % 1024, 0, 0, 0, 0, 0], 0)
+            next_write += JOYSTICK_PERIOD
+            time.sleep(max(0.0, next_write - time.monotonic()))
+        time.sleep(0.1)
+
+        uplink.close()
+        reader.stop()
+        log = orin.commands_logged()
+    arduino.unplug()
+
+    log = log[log['kind'] == KIND_CONTROL]
+    values, first = np.unique(log['axes'][:, 0], return_index=True)
+    # Counter values wrap at 1024, only use the first lap
+    keep = values < min(count, 1024)
+    latency = log['recv_time'][first[keep]] - written[values[keep]]
+    return latency, len(values[keep]) / min(count, 1024), uplink.stats()
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print('{:>9}{:>10}{:>10}{:>10}{:>10}{:>12}'.format('tick Hz', 'p50 ms', 'p99 ms', 'max ms', 'seen %', 'missed'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for rate in TICK_RATES:
+            latency, seen, stats = bench_rate(rate, duration, os.path.join(tmp, 'ttyACM0'))
+            print('{:>9.0f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.1f}{:>12}'.format(
+                rate, np.percentile(latency, 50) * 1000, np.percentile(latency, 99) * 1000,
+                latency.max() * 1000, seen * 100, stats['missed_ticks']))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,68 +15,39 @@ import os
 import sys
 import datetime
 import logging
-import platform
-import subprocess
-from dataclasses import dataclass
+import argparse
+import time
 
 # Import custom libraries
-import PySimpleGUI as sg
-import numpy as np
-from numpysocket import NumpySocket
-import serial
-import yaml
+# PySimpleGUI is only imported when the GUI is actually opened (see load_gui), so the
+# headless station starts without it
+sg = None
 
-@dataclass
-class Joystick:
-    x_axis: float
-    y_axis: float
-    z_axis: float
+# Import surface station modules
+from surface_package.render import RenderScheduler, format_float, format_percent
+from surface_package.station import StationCore
 
-@dataclass
-class Controller:
-    left: Joystick
-    right: Joystick
-    buttons: dict
 
+def load_gui():
+    global sg
+    if sg is None:
+        import PySimpleGUI
+        sg = PySimpleGUI
+    return sg
 
-# Define the main class
+
+# Define the main class. The GUI is only a view of a StationCore: it subscribes to the
+# core's display values and forwards button presses to it.
 class surfaceStation:
-    def __init__(self):
-        # Create an instance of the Controller class
-        self.controller = Controller(Joystick(0.0, 0.0, 0.0), Joystick(0.0, 0.0, 0.0), 
-                                {"button" + str(i): False for i in range(1, 11)})
+    def __init__(self, core):
+        self.core = core
+        # The layout is built from the config at startup, reloads only affect the core
+        self.config = core.config
         
         # Set the theme
+        load_gui()
         sg.theme('DarkAmber')
         
-        # Initialize the logger to output to both the console and a file
-        logging.basicConfig(
-            filename='logs/surfaceStation.log', 
-            filemode='a', 
-            format='%(asctime)s - %(levelname)s - %(message)s', 
-            level=logging.DEBUG)
-        
-        # Load the configuration file
-        try:
-            with open('configs/surface_station.yml', 'r') as f:
-                self.config = yaml.load(f, Loader=yaml.FullLoader)
-        except Exception as e:
-            logging.error('Error loading configuration file: {}'.format(e))
-            sys.exit(1)
-                      
-        # If self.config['serial'] is true, then initialize the serial port at the specified baudrate and specified port
-        if self.config['serial'] == 1:
-            self.ser = serial.Serial(self.config['port'], self.config['baudrate'], timeout=int(self.config['timeout']))
-            logging.info('Serial port initialized')
-            
-            # Read in the joystick data and store it in self.joystick
-            self.joystick = self.ser.readline().decode('utf-8').strip().split(',')
-            logging.info('Joystick data read in %s', self.joystick)
-            
-        else:
-            self.ser = None
-            logging.info('Serial port not initialized')
-            
         title_size = (25, 1)
         label_size = (20, 1)
         data_label_size = (17, 1)
@@ -97,50 +68,52 @@ class surfaceStation:
                     [sg.Text('Sensors', size=data_label_size,  font=("Helvetica", font_size)), sg.Text('0', key='sensors', size=data_size,  font=("Helvetica", font_size))],
                     [sg.HorizontalSeparator()],
                     [sg.Text('Motor Configuration', size=label_size,  font=("Helvetica", font_size))],
-                    [sg.Text('Motor Speed Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['motor_speed_max'], size=data_size, key='motor_speed_max',  font=("Helvetica", font_size))],
-                    [sg.Text('Motor Speed Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['motor_speed_min'], size=data_size, key='motor_speed_min',  font=("Helvetica", font_size))],
+                    [sg.Text('Motor Speed Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.motor_speed_max, size=data_size, key='motor_speed_max',  font=("Helvetica", font_size))],
+                    [sg.Text('Motor Speed Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.motor_speed_min, size=data_size, key='motor_speed_min',  font=("Helvetica", font_size))],
                     [sg.HorizontalSeparator()],
                     [sg.Text('Camera Configuration', size=label_size,  font=("Helvetica", font_size))],
-                    [sg.Text('Camera 1 Res: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['camera_1_resolution'], size=data_size, key='camera_1_resolution',  font=("Helvetica", font_size))],
-                    [sg.Text('Camera 2 Res: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['camera_2_resolution'], size=data_size, key='camera_2_resolution',  font=("Helvetica", font_size))],
-                    [sg.Text('Camera 1 FPS: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['camera_1_fps'], size=data_size, key='camera_1_fps',  font=("Helvetica", font_size))],
-                    [sg.Text('Camera 2 FPS: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['camera_2_fps'], size=data_size, key='camera_2_fps',  font=("Helvetica", font_size))],
+                    [sg.Text('Camera 1 Res: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.camera_1_resolution, size=data_size, key='camera_1_resolution',  font=("Helvetica", font_size))],
+                    [sg.Text('Camera 2 Res: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.camera_2_resolution, size=data_size, key='camera_2_resolution',  font=("Helvetica", font_size))],
+                    [sg.Text('Camera 1 FPS: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.camera_1_fps, size=data_size, key='camera_1_fps',  font=("Helvetica", font_size))],
+                    [sg.Text('Camera 2 FPS: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.camera_2_fps, size=data_size, key='camera_2_fps',  font=("Helvetica", font_size))],
                     [sg.HorizontalSeparator()],
                     [sg.Text('Servo Configuration', size=label_size,  font=("Helvetica", font_size))],
-                    [sg.Text('Servo 1 Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['servo_1_min'], size=data_size, key='servo_1_min',  font=("Helvetica", font_size))],
-                    [sg.Text('Servo 1 Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['servo_1_max'], size=data_size, key='servo_1_max',  font=("Helvetica", font_size))],
-                    [sg.Text('Servo 2 Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['servo_2_min'], size=data_size, key='servo_2_min',  font=("Helvetica", font_size))],
-                    [sg.Text('Servo 2 Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['servo_2_max'], size=data_size, key='servo_2_max',  font=("Helvetica", font_size))],
+                    [sg.Text('Servo 1 Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.servo_1_min, size=data_size, key='servo_1_min',  font=("Helvetica", font_size))],
+                    [sg.Text('Servo 1 Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.servo_1_max, size=data_size, key='servo_1_max',  font=("Helvetica", font_size))],
+                    [sg.Text('Servo 2 Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.servo_2_min, size=data_size, key='servo_2_min',  font=("Helvetica", font_size))],
+                    [sg.Text('Servo 2 Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.servo_2_max, size=data_size, key='servo_2_max',  font=("Helvetica", font_size))],
                     [sg.HorizontalSeparator()],
                     [sg.Text('Sensor Configuration', size=label_size,  font=("Helvetica", font_size))],
-                    [sg.Text('Temperature Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['Celsius', 'Fahrenheit'], default_value=self.config['temperature_unit'], size=data_size, key='temperature_unit',  font=("Helvetica", font_size))],
-                    [sg.Text('Humidity Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['%', 'g/m3'], default_value=self.config['humidity_unit'], size=data_size, key='humidity_unit',  font=("Helvetica", font_size))],
-                    [sg.Text('Voltage Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['V', 'mV'], default_value=self.config['voltage_unit'], size=data_size, key='voltage_unit',  font=("Helvetica", font_size))],
-                    [sg.Text('Current Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['A', 'mA'], default_value=self.config['current_unit'], size=data_size, key='current_unit',  font=("Helvetica", font_size))],
-                    [sg.Text('IMU Axis Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['imu_axis_min'], size=data_size, key='imu_axis_min',  font=("Helvetica", font_size))],
-                    [sg.Text('IMU Axis Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['imu_axis_max'], size=data_size, key='imu_axis_max',  font=("Helvetica", font_size))],
-                    [sg.Text('Pressure Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['Pa', 'hPa', 'kPa', 'MPa'], default_value=self.config['pressure_unit'], size=data_size, key='pressure_unit',  font=("Helvetica", font_size))],
+                    [sg.Text('Temperature Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['Celsius', 'Fahrenheit'], default_value=self.config.temperature_unit, size=data_size, key='temperature_unit',  font=("Helvetica", font_size))],
+                    [sg.Text('Humidity Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['%', 'g/m3'], default_value=self.config.humidity_unit, size=data_size, key='humidity_unit',  font=("Helvetica", font_size))],
+                    [sg.Text('Voltage Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['V', 'mV'], default_value=self.config.voltage_unit, size=data_size, key='voltage_unit',  font=("Helvetica", font_size))],
+                    [sg.Text('Current Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['A', 'mA'], default_value=self.config.current_unit, size=data_size, key='current_unit',  font=("Helvetica", font_size))],
+                    [sg.Text('IMU Axis Min: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.imu_axis_min, size=data_size, key='imu_axis_min',  font=("Helvetica", font_size))],
+                    [sg.Text('IMU Axis Max: ', size=data_label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.imu_axis_max, size=data_size, key='imu_axis_max',  font=("Helvetica", font_size))],
+                    [sg.Text('Pressure Unit: ', size=data_label_size,  font=("Helvetica", font_size)), sg.Combo(['Pa', 'hPa', 'kPa', 'MPa'], default_value=self.config.pressure_unit, size=data_size, key='pressure_unit',  font=("Helvetica", font_size))],
                     [sg.HorizontalSeparator()],
                 ], size=(320, 1080)),
                 sg.Column([
                     [sg.Image('imgs/placeholder.png', key='camera_feed', size=(1280, 720))],
                     [
                         sg.Column([
-                            [sg.Text('Orin Status', size=label_size,  font=("Helvetica", font_size)), sg.Text('0', key='orin_status', size=data_size,  font=("Helvetica", font_size))],
-                            [sg.Text('Orin IP Address: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['orin_ip_address'], size=label_size, key='orin_ip_address',  font=("Helvetica", font_size))],
+                            [sg.Text('Orin Status', size=label_size,  font=("Helvetica", font_size)), sg.Text('0', key='orin_status', size=(26, 1),  font=("Helvetica", font_size))],
+                            [sg.Text('Orin IP Address: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.orin_ip_address, size=label_size, key='orin_ip_address',  font=("Helvetica", font_size))],
                             [sg.Button('Ping Orin', size=data_size, key='ping_orin', font=("Helvetica", font_size)) , sg.Button('Connect', size=data_size, key='connect_orin', font=("Helvetica", font_size))],
+                            [sg.Button('Start', size=data_size, key='start_sub', font=("Helvetica", font_size)), sg.Button('E-Stop', size=data_size, key='emergency_stop', button_color=('white', 'red'), font=("Helvetica", font_size))],
                         ], size=(640, 150)),
                         sg.Column([
                             [sg.Text('Arduino Configuration', size=label_size,  font=("Helvetica", font_size))],
-                            [sg.Text('Arduino Serial Port: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['arduino_serial_port'], size=label_size, key='arduino_serial_port',  font=("Helvetica", font_size))],
-                            [sg.Text('Arduino Baudrate: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['arduino_baudrate'], size=label_size, key='arduino_baudrate',  font=("Helvetica", font_size))],
-                            [sg.Text('Arduino Timeout: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config['arduino_timeout'], size=label_size, key='arduino_timeout',  font=("Helvetica", font_size))],
+                            [sg.Text('Arduino Serial Port: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.arduino_serial_port, size=label_size, key='arduino_serial_port',  font=("Helvetica", font_size))],
+                            [sg.Text('Arduino Baudrate: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.arduino_baudrate, size=label_size, key='arduino_baudrate',  font=("Helvetica", font_size))],
+                            [sg.Text('Arduino Timeout: ', size=label_size,  font=("Helvetica", font_size)), sg.InputText(self.config.arduino_timeout, size=label_size, key='arduino_timeout',  font=("Helvetica", font_size))],
                             [sg.Button('Connect', size=data_size, key='connect_arduino', font=("Helvetica", font_size))],
                         ], size=(640, 150)),
                     ],
                     [sg.HorizontalSeparator()],
                     [sg.Text('Battery 1', size=label_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery1', size=data_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery1', size=data_size,  font=("Helvetica", font_size)), sg.Text('V', size=data_size,  font=("Helvetica", font_size)), sg.Text('Battery 3', size=label_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery3', size=data_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery3', size=data_size,  font=("Helvetica", font_size)), sg.Text('V', size=data_size,  font=("Helvetica", font_size))],
                     [sg.Text('Battery 2', size=label_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery2', size=data_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery2', size=data_size,  font=("Helvetica", font_size)), sg.Text('V', size=data_size,  font=("Helvetica", font_size)), sg.Text('Battery 4', size=label_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery4', size=data_size,  font=("Helvetica", font_size)), sg.Text('0', key='battery4', size=data_size,  font=("Helvetica", font_size)), sg.Text('V', size=data_size,  font=("Helvetica", font_size))],
+                    [sg.Canvas(key='plots', size=(1280, 170))],
                 ], size=(1280, 1080)),
                 sg.Column([
                     [sg.Text('IMU Data', size=label_size,  font=("Helvetica", font_size))],
@@ -183,80 +156,130 @@ class surfaceStation:
         # Create the window using the layout loaded
         self.window = sg.Window('Surface Station', layout, size=(1920, 1080), element_justification='c', finalize=True)
         
-        # Run the GUI
-        self.run()
+        # Telemetry widgets are only redrawn by the render scheduler, at most gui_fps times a second
+        self.renderer = RenderScheduler(self.window, fps=self.config.gui_fps)
+        for key in ('imu_roll', 'imu_pitch', 'imu_yaw', 'depth', 'temperature', 'humidity'):
+            self.renderer.register(key, format_float)
+        for i in range(1, 9):
+            self.renderer.register('motor{}_progress'.format(i), format_percent, progress=True)
+        for i in range(1, 4):
+            self.renderer.register('servo{}_progress'.format(i), format_percent, progress=True)
+        self.renderer.register('orin_status')
         
-    def ping_orin(self, host):
-        # Ping parameters as function of OS
-        parameters = "-n 1" if platform.system().lower()=="windows" else "-c 1"
-
-        # Pinging
-        try:
-            output = subprocess.check_output("ping " + parameters + " " + host, shell=True)
-            if "unreachable" in output.lower():
-                return False
-            else:
-                return True
-        except Exception:
-            return False
-    
-    # Data format is as follows:
-    # left_x,left_y,left_z,right_x,right_y,right_z,button1,button2,button3,button4,button5,button6,button7,button8, button9, button10
-    def update_controller(self, data, controller):
-        values = data.split(',')
-        controller.left.x_axis = float(values[0])
-        controller.left.y_axis = float(values[1])
-        controller.left.z_axis = float(values[2])
-        controller.right.x_axis = float(values[3])
-        controller.right.y_axis = float(values[4])
-        controller.right.z_axis = float(values[5])
-        for i, val in enumerate(values[6:]):
-            controller.buttons["button" + str(i + 1)] = val == 'True'
-    
-    def serial_thread(self):
-        self.ser = serial.Serial(self.values['arduino_serial_port'], self.values['arduino_baud_rate'], timeout=self.values['arduino_timeout'])
-        while True:
-            data = self.ser.readline().decode('utf-8').rstrip()
-            self.update_controller(data, self.controller)
-    
-    def parse_imu_data(self, data):
-        pass
-    
-    def parse_acoustics_data(self, data):
-        pass
-    
-    def update_gui(self, imu, acoustics):
-        pass
-    
-    def recv_data(self):
-        pass
-    
-    def start_sub(self):
-        pass
+        # Rolling plots of attitude, depth and motors, redrawn at most plot_fps times a second
+        from surface_package.plots import RollingPlot, embed
+        self.plots = RollingPlot(window=self.config.plot_window, rate=self.config.plot_rate, columns=3)
+        self.plots.figure.set_size_inches(12.8, 1.7)
+        self.plots_canvas = embed(self.plots, self.window['plots'].TKCanvas)
+        self.plot_period = 1.0 / self.config.plot_fps
+        self.plot_ring = None
+        self.plot_dirty = False
+        self.last_plot = 0.0
+        
+        # Display values from the core are only queued here, run() draws them
+        self.core.subscribe(self.update_gui)
+        
+    # Queue telemetry for display, values is a mapping of widget key to value. Safe to call
+    # from any thread, the widgets are only touched by the GUI loop in run()
+    def update_gui(self, values):
+        self.renderer.update_many(values)
     
-    def emergency_stop(self):
-        pass
+    # Copy new telemetry into the plots and redraw them if a plot frame is due
+    def update_plots(self):
+        ring = self.core.telemetry_ring
+        if ring is None:
+            return
+        if ring is not self.plot_ring:
+            # Connected again or started a replay, the new ring counts from zero
+            self.plot_ring = ring
+            self.plots.seen = 0
+        if self.plots.feed(ring):
+            self.plot_dirty = True
+        now = time.monotonic()
+        if self.plot_dirty and now - self.last_plot >= self.plot_period:
+            self.last_plot = now
+            self.plot_dirty = False
+            self.plots.draw()
     
     def run(self):
-        self.event, self.values = self.window.read(timeout=100)
+        self.event, self.values = self.window.read(timeout=self.renderer.timeout_ms)
         while True:
-            self.event, self.values = self.window.read(timeout=100)
+            self.event, self.values = self.window.read(timeout=self.renderer.timeout_ms)
             
-            if self.ser is not None:
-                pass
-
+            # Push whatever changed since the last frame
+            self.core.poll()
+            self.renderer.flush()
+            self.update_plots()
             
-            
-            if self.event == 'ping_orin':
+            if self.event == 'emergency_stop':
+                try:
+                    self.core.emergency_stop(self.values['orin_ip_address'])
+                except Exception as e:
+                    logging.error('Error sending emergency stop: %s', e)
+            elif self.event == 'start_sub':
+                try:
+                    self.core.start_sub(self.values['orin_ip_address'])
+                except Exception as e:
+                    logging.error('Error starting the sub: %s', e)
+            elif self.event == 'connect_arduino':
+                try:
+                    self.core.start_serial(self.values['arduino_serial_port'], self.values['arduino_baudrate'], self.values['arduino_timeout'])
+                except Exception as e:
+                    logging.error('Error connecting to the Arduino: %s', e)
+            elif self.event == 'connect_orin':
+                try:
+                    self.core.connect_orin(self.values['orin_ip_address'])
+                except Exception as e:
+                    logging.error('Error connecting to ORIN: %s', e)
+            elif self.event == 'ping_orin':
+                # The link monitor measures continuously, this only points it at the address typed in
                 try:
-                    status = self.ping_orin(self.values['orin_ip_address'])
-                    self.window['orin_status'].update('1' if status else '0')
-                    logging.info('Pinging ORIN: %s with Status: %s', self.values['orin_ip_address'], status)
+                    self.core.monitor_link(self.values['orin_ip_address'])
                 except Exception as e:
-                    logging.error('Error pinging ORIN: %s', e)        
+                    logging.error('Error pinging ORIN: %s', e)
             elif self.event == sg.WIN_CLOSED:
+                logging.info('Render stats: %s', self.renderer.stats())
+                logging.info('Plot stats: %s', self.plots.stats())
                 break
         
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AUV surface station')
+    parser.add_argument('--headless', action='store_true', help='run without the GUI, logging stats to the console')
+    parser.add_argument('--replay', help='play back a recording from logs/recordings instead of using the hardware')
+    parser.add_argument('--speed', default='1', help='replay speed as a multiple of real time, or "max"')
+    parser.add_argument('--config', default='configs/surface_station.yml', help='station configuration file')
+    parser.add_argument('--connect', action='store_true', help='connect to the Orin telemetry on startup')
+    parser.add_argument('--start', action='store_true', help='start the sub on startup (implies --connect)')
+    args = parser.parse_args(argv)
+    
+    # Initialize the logger to output to a file, and to the console when headless
+    logging.basicConfig(
+        filename='logs/surfaceStation.log', 
+        filemode='a', 
+        format='%(asctime)s - %(levelname)s - %(message)s', 
+        level=logging.INFO)
+    if args.headless:
+        logging.getLogger().addHandler(logging.StreamHandler())
+    
+    # Load the configuration file (watched for changes from here on) and build the core
+    try:
+        core = StationCore(config_path=args.config, replay=args.replay,
+                           speed=None if args.speed == 'max' else float(args.speed))
+    except Exception as e:
+        logging.error('Error loading the station configuration: {}'.format(e))
+        sys.exit(1)
+    
+    core.start(connect=args.connect, start_sub=args.start)
+    logging.info('Station ready')
+    try:
+        if args.headless:
+            core.run(rate=core.config.gui_fps)
+        else:
+            surfaceStation(core).run()
+    finally:
+        core.shutdown()
+
+
 if __name__ == '__main__':
-    ss = surfaceStation()
\ No newline at end of file
+    main()
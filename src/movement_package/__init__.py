@@ -0,0 +1 @@
+# Movement support package
@@ -0,0 +1,146 @@
+# Joystick to thruster mixing
+#
+# Turns raw joystick axes (analogRead 0 - 1023) into PWM microseconds for the 8 motors and
+# 3 servos. Every step is a NumPy operation over the whole batch, a single sample is just a
+# batch of one:
+#   1. normalize the axes to -1 .. 1 and apply deadband and expo (a 1024 entry lookup
+#      table built once, since analogRead only ever returns integers)
+#   2. multiply by the allocation matrix (axis order and inversion already folded in)
+#   3. scale any sample whose largest thruster demand is over 1 back into range, so the
+#      direction of travel is kept instead of clipping single thrusters
+#   4. map to PWM around the motor neutral, add trims and clip to the motor limits
+# Servos are driven by buttons: pressed means servo max, released means servo min.
+
+import numpy as np
+
+NUM_AXES = 6
+NUM_MOTORS = 8
+NUM_SERVOS = 3
+NUM_BUTTONS = 10
+
+AXIS_CENTER = 511.5
+AXIS_RANGE = 1024
+
+# Degrees of freedom, in allocation matrix column order
+DOF = ('surge', 'sway', 'heave', 'roll', 'pitch', 'yaw')
+
+# Controller axes are left x, y, z then right x, y, z. By default the left stick moves
+# (y surge, x sway, z heave) and the right stick rotates (x roll, y pitch, z yaw).
+DEFAULT_AXIS_DOF = (1, 0, 2, 3, 4, 5)
+
+# Four vectored horizontal thrusters (1 - 4) and four vertical thrusters (5 - 8)
+DEFAULT_MATRIX = (
+    (1.0, -1.0, 0.0, 0.0, 0.0, 1.0),
+    (1.0, 1.0, 0.0, 0.0, 0.0, -1.0),
+    (-1.0, -1.0, 0.0, 0.0, 0.0, -1.0),
+    (-1.0, 1.0, 0.0, 0.0, 0.0, 1.0),
+    (0.0, 0.0, 1.0, -1.0, -1.0, 0.0),
+    (0.0, 0.0, 1.0, 1.0, -1.0, 0.0),
+    (0.0, 0.0, 1.0, -1.0, 1.0, 0.0),
+    (0.0, 0.0, 1.0, 1.0, 1.0, 0.0),
+)
+
+
+class Mixer:
+    def __init__(self, matrix=DEFAULT_MATRIX, deadband=0.05, expo=0.0, trims=None,
+                 motor_min=1250, motor_max=1750, servo_min=None, servo_max=None,
+                 servo_buttons=(1, 2, 3), axis_dof=DEFAULT_AXIS_DOF, axis_invert=None):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.shape != (NUM_MOTORS, len(DOF)):
+            raise ValueError('mixer matrix must be {}x{}, got {}'.format(NUM_MOTORS, len(DOF), matrix.shape))
+        if not 0.0 <= deadband < 1.0:
+            raise ValueError('mixer deadband must be in [0, 1), got {}'.format(deadband))
+        if not 0.0 <= expo <= 1.0:
+            raise ValueError('mixer expo must be in [0, 1], got {}'.format(expo))
+        if motor_max <= motor_min:
+            raise ValueError('motor_speed_max must be above motor_speed_min')
+        if len(servo_buttons) != NUM_SERVOS or not all(1 <= b <= NUM_BUTTONS for b in servo_buttons):
+            raise ValueError('servo buttons must be {} button numbers in 1 - {}, got {}'.format(
+                NUM_SERVOS, NUM_BUTTONS, tuple(servo_buttons)))
+
+        invert = np.ones(NUM_AXES) if axis_invert is None else np.where(np.asarray(axis_invert, dtype=bool), -1.0, 1.0)
+        # Column i of the allocation matrix is the thrust per unit of controller axis i
+        self.allocation = np.ascontiguousarray((matrix[:, list(axis_dof)] * invert).T)
+
+        self.deadband = float(deadband)
+        self.deadband_scale = 1.0 / (1.0 - self.deadband)
+        self.expo = float(expo)
+        self.axis_table = self._shape(np.arange(AXIS_RANGE, dtype=np.float64))
+
+        trims = np.zeros(NUM_MOTORS) if trims is None else np.asarray(trims, dtype=np.float64)
+        self.motor_min = float(motor_min)
+        self.motor_max = float(motor_max)
+        self.motor_half = (self.motor_max - self.motor_min) / 2.0
+        self.motor_offset = (self.motor_max + self.motor_min) / 2.0 + trims
+
+        servo_min = np.full(NUM_SERVOS, 1000.0) if servo_min is None else np.asarray(servo_min, dtype=np.float64)
+        servo_max = np.full(NUM_SERVOS, 2000.0) if servo_max is None else np.asarray(servo_max, dtype=np.float64)
+        self.servo_min = servo_min
+        self.servo_span = servo_max - servo_min
+        self.servo_shift = np.asarray(servo_buttons, dtype=np.uint16) - 1
+        # PWM for each of the 1024 possible button masks
+        pressed = (np.arange(1 << NUM_BUTTONS, dtype=np.uint16)[:, None] >> self.servo_shift) & 1
+        self.servo_table = (self.servo_min + pressed * self.servo_span).astype(np.uint16)
+
+    @classmethod
+    def from_config(cls, config):
+        # config is a StationConfig (surface_package/config.py), already parsed and validated
+        return cls(matrix=config.mixer_matrix,
+                   deadband=config.mixer_deadband,
+                   expo=config.mixer_expo,
+                   trims=config.motor_trim,
+                   motor_min=config.motor_speed_min,
+                   motor_max=config.motor_speed_max,
+                   servo_min=[config.servo_1_min, config.servo_2_min, config.servo_3_min],
+                   servo_max=[config.servo_1_max, config.servo_2_max, config.servo_3_max],
+                   servo_buttons=config.servo_buttons,
+                   axis_dof=config.mixer_axis_dof,
+                   axis_invert=config.mixer_axis_invert)
+
+    def _shape(self, axes):
+        x = np.multiply(axes, 1.0 / AXIS_CENTER)
+        x -= 1.0
+        magnitude = np.abs(x)
+        magnitude -= self.deadband
+        np.maximum(magnitude, 0.0, out=magnitude)
+        magnitude *= self.deadband_scale
+        np.minimum(magnitude, 1.0, out=magnitude)
+        if self.expo:
+            # (1 - e) * m + e * m^3
+            magnitude *= (1.0 - self.expo) + self.expo * magnitude * magnitude
+        return np.copysign(magnitude, x, out=magnitude)
+
+    def shape_axes(self, axes):
+        # Raw axes (..., 6) to shaped -1 .. 1 demands
+        axes = np.asarray(axes)
+        if axes.dtype.kind in 'ui':
+            return self.axis_table[np.minimum(axes, AXIS_RANGE - 1)]
+        return self._shape(axes)
+
+    def thrust(self, axes):
+        # Normalized thruster demands (..., 8), each within -1 .. 1
+        thrust = self.shape_axes(axes) @ self.allocation
+        peak = np.abs(thrust).max(axis=-1, keepdims=True)
+        np.maximum(peak, 1.0, out=peak)
+        thrust /= peak
+        return thrust
+
+    def motors(self, axes):
+        pwm = self.thrust(axes)
+        pwm *= self.motor_half
+        pwm += self.motor_offset
+        np.minimum(pwm, self.motor_max, out=pwm)
+        np.maximum(pwm, self.motor_min, out=pwm)
+        return np.rint(pwm, out=pwm).astype(np.uint16)
+
+    def servos(self, buttons):
+        return self.servo_table[np.asarray(buttons) & ((1 << NUM_BUTTONS) - 1)]
+
+    def mix(self, axes, buttons):
+        # Returns (motors, servos) PWM arrays shaped (..., 8) and (..., 3)
+        return self.motors(axes), self.servos(buttons)
+
+    def __call__(self, sample):
+        # Mix one controller sample (a record with 'axes' and 'buttons'), for CommandUplink
+        motors, servos = self.mix(sample['axes'], sample['buttons'])
+        return motors.tolist(), servos.tolist()
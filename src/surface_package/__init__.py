@@ -0,0 +1,2 @@
+# Surface station support package
+# Everything in here is imported by src/main.py and is safe to use without a display
@@ -0,0 +1,45 @@
+# Local stand-in for the Arduino controller
+#
+# A pty that speaks the same binary frames as arduino/AUV/AUV.ino. The slave side is exposed
+# through a symlink (like /dev/ttyACM0) so it can be unplugged and plugged back in.
+
+import os
+import tty
+
+import numpy as np
+
+from surface_package.protocol import SAMPLE_DTYPE, encode_frames
+
+
+class FakeArduino:
+    def __init__(self, link):
+        self.link = link
+        self.master = None
+        self.plug()
+
+    def plug(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        if os.path.lexists(self.link):
+            os.unlink(self.link)
+        os.symlink(os.ttyname(slave), self.link)
+        os.close(slave)
+        self.seq = 0
+
+    def unplug(self):
+        if self.master is not None:
+            os.close(self.master)
+            self.master = None
+        if os.path.lexists(self.link):
+            os.unlink(self.link)
+
+    def send(self, axes, buttons, count=1):
+        samples = np.zeros(count, dtype=SAMPLE_DTYPE)
+        samples['seq'] = (self.seq + np.arange(count)) % 256
+        samples['axes'] = axes
+        samples['buttons'] = buttons
+        self.seq += count
+        self.write(encode_frames(samples))
+
+    def write(self, data):
+        os.write(self.master, data)
@@ -0,0 +1,324 @@
+# Typed station configuration
+#
+# configs/surface_station.yml is parsed and validated once into a frozen StationConfig.
+# Every value has its final type (camera resolutions are tuples, timeouts are floats,
+# flags are bools) and the tables the hot paths need (the mixer, PWM to percent scaling)
+# are built at the same time. Nothing downstream looks up dict keys or parses strings.
+#
+# A StationConfig never changes. ConfigWatcher reloads the file when it changes and hands
+# over a complete new StationConfig, so a reload is a single reference swap: readers see
+# either the old config or the new one, never a mix. A file that fails to parse or
+# validate is logged and the running config is kept.
+
+import ast
+import dataclasses
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import yaml
+
+from movement_package.mixer import DEFAULT_AXIS_DOF, DEFAULT_MATRIX, NUM_BUTTONS, NUM_MOTORS, NUM_SERVOS, Mixer
+
+CONFIG_PATH = 'configs/surface_station.yml'
+
+# Older config files and GUI code used this spelling
+ALIASES = {'arduino_baud_rate': 'arduino_baudrate'}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+# Converters, each takes the raw YAML value and returns the typed value or raises ValueError
+
+def flag(value):
+    if value in (0, 1, True, False):
+        return bool(value)
+    raise ValueError('expected 0 or 1, got {!r}'.format(value))
+
+
+def integer(low=None, high=None):
+    def convert(value):
+        if isinstance(value, bool) or not math.isfinite(float(value)) or float(value) != int(float(value)):
+            raise ValueError('expected an integer, got {!r}'.format(value))
+        value = int(float(value))
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ValueError('{} is outside [{}, {}]'.format(value, low, high))
+        return value
+    return convert
+
+
+def number(low=None, high=None):
+    def convert(value):
+        if isinstance(value, bool):
+            raise ValueError('expected a number, got {!r}'.format(value))
+        value = float(value)
+        # NaN compares false against every bound, so it would pass the range check below
+        if not math.isfinite(value):
+            raise ValueError('expected a finite number, got {!r}'.format(value))
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ValueError('{} is outside [{}, {}]'.format(value, low, high))
+        return value
+    return convert
+
+
+def text(value):
+    if not isinstance(value, str) or not value:
+        raise ValueError('expected a non empty string, got {!r}'.format(value))
+    return value
+
+
+def choice(*options):
+    def convert(value):
+        if value not in options:
+            raise ValueError('{!r} is not one of {}'.format(value, ', '.join(options)))
+        return value
+    return convert
+
+
+def int_tuple(length, low=None, high=None):
+    # Lists, or strings such as "(1280, 720)"
+    def convert(value):
+        if isinstance(value, str):
+            value = ast.literal_eval(value)
+        value = tuple(integer(low, high)(v) for v in value)
+        if len(value) != length:
+            raise ValueError('expected {} values, got {}'.format(length, len(value)))
+        return value
+    return convert
+
+
+def number_tuple(length):
+    def convert(value):
+        value = tuple(number()(v) for v in value)
+        if len(value) != length:
+            raise ValueError('expected {} values, got {}'.format(length, len(value)))
+        return value
+    return convert
+
+
+def matrix(value):
+    value = tuple(number_tuple(6)(row) for row in value)
+    if len(value) != NUM_MOTORS:
+        raise ValueError('expected {} rows, got {}'.format(NUM_MOTORS, len(value)))
+    return value
+
+
+def optional(convert):
+    return lambda value: None if value is None else convert(value)
+
+
+def setting(default, convert):
+    return field(default=default, metadata={'convert': convert})
+
+
+def derived():
+    return field(init=False, repr=False, compare=False)
+
+
+@dataclass(frozen=True, slots=True)
+class StationConfig:
+    mode: str = setting('AUV', choice('AUV', 'manual'))
+    serial: bool = setting(False, flag)
+    motors: bool = setting(False, flag)
+    camera: bool = setting(False, flag)
+    servos: bool = setting(False, flag)
+    sensors: bool = setting(False, flag)
+
+    motor_speed_min: int = setting(1250, integer(500, 2500))
+    motor_speed_max: int = setting(1750, integer(500, 2500))
+    motor_trim: tuple = setting((0.0,) * NUM_MOTORS, number_tuple(NUM_MOTORS))
+    servo_1_min: int = setting(1000, integer(500, 2500))
+    servo_1_max: int = setting(2000, integer(500, 2500))
+    servo_2_min: int = setting(1000, integer(500, 2500))
+    servo_2_max: int = setting(2000, integer(500, 2500))
+    servo_3_min: int = setting(1000, integer(500, 2500))
+    servo_3_max: int = setting(2000, integer(500, 2500))
+    servo_buttons: tuple = setting((1, 2, 3), int_tuple(NUM_SERVOS, 1, NUM_BUTTONS))
+
+    mixer_deadband: float = setting(0.05, number(0.0, 0.99))
+    mixer_expo: float = setting(0.0, number(0.0, 1.0))
+    mixer_matrix: tuple = setting(DEFAULT_MATRIX, matrix)
+    mixer_axis_dof: tuple = setting(DEFAULT_AXIS_DOF, int_tuple(6))
+    mixer_axis_invert: tuple = setting(None, optional(int_tuple(6)))
+
+    camera_1_resolution: tuple = setting((1280, 720), int_tuple(2))
+    camera_1_fps: int = setting(60, integer(1, 240))
+    camera_2_resolution: tuple = setting((1280, 720), int_tuple(2))
+    camera_2_fps: int = setting(60, integer(1, 240))
+
+    temperature_unit: str = setting('Celsius', choice('Celsius', 'Fahrenheit'))
+    humidity_unit: str = setting('%', choice('%', 'g/m3'))
+    voltage_unit: str = setting('V', choice('V', 'mV'))
+    current_unit: str = setting('A', choice('A', 'mA'))
+    pressure_unit: str = setting('Pa', choice('Pa', 'hPa', 'kPa', 'MPa'))
+    imu_axis_min: float = setting(-180.0, number())
+    imu_axis_max: float = setting(180.0, number())
+
+    orin_ip_address: str = setting('192.168.1.140', text)
+    telemetry_port: int = setting(5005, integer(1, 65535))
+    command_port: int = setting(5006, integer(1, 65535))
+    command_rate: float = setting(50.0, number(1.0, 1000.0))
+    command_stale_timeout: float = setting(0.5, number(0.01, 60.0))
+    heartbeat_port: int = setting(5007, integer(1, 65535))
+    heartbeat_rate: float = setting(10.0, number(0.1, 1000.0))
+
+    arduino_serial_port: str = setting('/dev/ttyACM0', text)
+    arduino_baudrate: int = setting(115200, integer(300, 4000000))
+    arduino_timeout: float = setting(0.1, number(0.0, 60.0))
+    arduino_sample_rate: float = setting(100.0, number(1.0, 10000.0))
+
+    gui_fps: float = setting(30.0, number(1.0, 240.0))
+    plot_window: float = setting(60.0, number(1.0, 3600.0))
+    plot_rate: float = setting(1000.0, number(1.0, 100000.0))
+    plot_fps: float = setting(15.0, number(1.0, 240.0))
+
+    record: bool = setting(False, flag)
+    recording_dir: str = setting('logs/recordings', text)
+
+    instrument: bool = setting(False, flag)
+    stats_interval: float = setting(10.0, number(0.1, 3600.0))
+
+    # Built from the settings above in __post_init__
+    mixer: Mixer = derived()
+    servo_min: tuple = derived()
+    servo_max: tuple = derived()
+    motor_percent_offset: float = derived()
+    motor_percent_scale: float = derived()
+    servo_percent_offset: np.ndarray = derived()
+    servo_percent_scale: np.ndarray = derived()
+
+    def __post_init__(self):
+        if self.motor_speed_max <= self.motor_speed_min:
+            raise ConfigError('motor_speed_max must be above motor_speed_min')
+        if self.imu_axis_max <= self.imu_axis_min:
+            raise ConfigError('imu_axis_max must be above imu_axis_min')
+        servo_min = (self.servo_1_min, self.servo_2_min, self.servo_3_min)
+        servo_max = (self.servo_1_max, self.servo_2_max, self.servo_3_max)
+        for i in range(NUM_SERVOS):
+            if servo_max[i] <= servo_min[i]:
+                raise ConfigError('servo_{0}_max must be above servo_{0}_min'.format(i + 1))
+        try:
+            mixer = Mixer.from_config(self)
+        except ValueError as e:
+            raise ConfigError(str(e))
+
+        # Frozen, so derived values are set the same way dataclasses sets fields
+        set_derived = object.__setattr__
+        set_derived(self, 'mixer', mixer)
+        set_derived(self, 'servo_min', servo_min)
+        set_derived(self, 'servo_max', servo_max)
+        # percent = (pwm - offset) * scale
+        set_derived(self, 'motor_percent_offset', float(self.motor_speed_min))
+        set_derived(self, 'motor_percent_scale', 100.0 / (self.motor_speed_max - self.motor_speed_min))
+        set_derived(self, 'servo_percent_offset', np.array(servo_min, dtype=np.float64))
+        set_derived(self, 'servo_percent_scale', 100.0 / (np.array(servo_max, dtype=np.float64) - servo_min))
+
+    def replace(self, **changes):
+        # A new validated config with some settings changed, each value is converted and
+        # checked the same way as in the config file
+        for name, value in changes.items():
+            if name not in SETTINGS_BY_NAME:
+                raise ConfigError('{}: unknown setting'.format(name))
+            changes[name] = convert_setting(SETTINGS_BY_NAME[name], value)
+        return dataclasses.replace(self, **changes)
+
+
+SETTINGS = tuple(f for f in dataclasses.fields(StationConfig) if f.init)
+SETTINGS_BY_NAME = {f.name: f for f in SETTINGS}
+
+
+def convert_setting(setting_field, value):
+    try:
+        return setting_field.metadata['convert'](value)
+    except (ValueError, TypeError, SyntaxError, OverflowError) as e:
+        raise ConfigError('{}: {}'.format(setting_field.name, e))
+
+
+def parse_config(raw):
+    # Validate a mapping (parsed YAML) into a StationConfig, missing keys take their defaults
+    raw = {ALIASES.get(key, key): value for key, value in (raw or {}).items()}
+    values = {}
+    for setting_field in SETTINGS:
+        if setting_field.name not in raw:
+            continue
+        values[setting_field.name] = convert_setting(setting_field, raw.pop(setting_field.name))
+    for key in raw:
+        logging.warning('Unknown config key ignored: %s', key)
+    return StationConfig(**values)
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path, 'r') as f:
+        return parse_config(yaml.safe_load(f))
+
+
+class ConfigWatcher:
+    # Polls the config file and calls on_change(new_config) from its own thread whenever it
+    # changed and still parses. Polling the mtime is cheap and needs no extra dependency.
+    def __init__(self, path, on_change, interval=1.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.signature = self._signature()
+
+        # Counters
+        self.reloads = 0
+        self.errors = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='config_watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {'reloads': self.reloads, 'errors': self.errors}
+
+    def check(self):
+        # Reload if the file changed since the last check, returns the new config or None
+        signature = self._signature()
+        if signature is None or signature == self.signature:
+            return None
+        self.signature = signature
+        try:
+            config = load_config(self.path)
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            # Half written or invalid, keep running on the old config until the next change
+            self.errors += 1
+            logging.error('Config reload of %s failed, keeping the running config: %s', self.path, e)
+            return None
+        self.reloads += 1
+        self.on_change(config)
+        return config
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # A bug in a reload must not silently end hot reload for the rest of the run
+                self.errors += 1
+                logging.exception('Config reload of %s failed unexpectedly', self.path)
@@ -0,0 +1,44 @@
+# Controller state shared by the serial link, the GUI and the uplink to the AUV
+
+from dataclasses import dataclass
+
+NUM_AXES = 6
+NUM_BUTTONS = 10
+
+# Button keys and bits are built once so hot paths never rebuild "button" + str(i)
+BUTTON_KEYS = tuple("button" + str(i) for i in range(1, NUM_BUTTONS + 1))
+BUTTON_BITS = tuple(1 << i for i in range(NUM_BUTTONS))
+
+
+@dataclass
+class Joystick:
+    x_axis: float
+    y_axis: float
+    z_axis: float
+
+
+@dataclass
+class Controller:
+    left: Joystick
+    right: Joystick
+    buttons: dict
+
+
+def new_controller():
+    # Create a controller with both joysticks centered at zero and every button released
+    return Controller(Joystick(0.0, 0.0, 0.0), Joystick(0.0, 0.0, 0.0),
+                      {key: False for key in BUTTON_KEYS})
+
+
+def apply_sample(controller, axes, button_mask):
+    # Copy a decoded sample (6 axes + button bitmask) into an existing Controller
+    controller.left.x_axis = float(axes[0])
+    controller.left.y_axis = float(axes[1])
+    controller.left.z_axis = float(axes[2])
+    controller.right.x_axis = float(axes[3])
+    controller.right.y_axis = float(axes[4])
+    controller.right.z_axis = float(axes[5])
+    mask = int(button_mask)
+    buttons = controller.buttons
+    for key, bit in zip(BUTTON_KEYS, BUTTON_BITS):
+        buttons[key] = (mask & bit) != 0
@@ -0,0 +1,164 @@
+# Link quality monitor for the Orin
+#
+# Sends a small UDP heartbeat rate times a second and the Orin echoes it straight back.
+# Every heartbeat carries its sequence number and send time, so the round trip time is
+# known as soon as the echo arrives. The last window heartbeats are kept in fixed arrays
+# indexed by seq % window, which gives rolling RTT, jitter and loss without any per
+# packet allocation.
+#
+# The monitor runs on its own asyncio event loop in a background thread, so neither the
+# GUI nor the uplink ever waits on the network; they only read the latest statistics.
+#
+# Heartbeat packet, little endian, 16 bytes:
+#   magic b'HBT1', seq (u32), sent_time (f8, time.monotonic() of the sender)
+
+import asyncio
+import logging
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'HBT1'
+HEARTBEAT = struct.Struct('<4sId')
+
+
+class _HeartbeatProtocol(asyncio.DatagramProtocol):
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def datagram_received(self, data, addr):
+        self.monitor._received(data, time.monotonic())
+
+    def error_received(self, exc):
+        # ICMP port unreachable and friends, the heartbeat just counts as lost
+        self.monitor.errors += 1
+        logging.debug('Link monitor error: %s', exc)
+
+
+class LinkMonitor:
+    def __init__(self, host, port, rate=10.0, window=100, timeout=1.0):
+        self.address = (host, port)
+        self.period = 1.0 / rate
+        self.window = window
+        # A heartbeat without an echo after timeout seconds is counted as lost
+        self.timeout = timeout
+
+        self.seqs = np.zeros(window, dtype=np.int64)
+        self.sent_at = np.zeros(window, dtype=np.float64)
+        self.rtt = np.full(window, np.nan)
+        self.packet = bytearray(HEARTBEAT.size)
+        self.seq = 0
+        self.last_reply = None
+
+        # Counters
+        self.sent = 0
+        self.received = 0
+        self.late = 0
+        self.errors = 0
+
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._loop = asyncio.new_event_loop()
+        self._stopping = asyncio.Event()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._run(),),
+                                        name='link_monitor', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout)
+        self._thread = None
+        self._loop.close()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _HeartbeatProtocol(self),
+                                                               remote_addr=self.address)
+        except OSError as e:
+            self.errors += 1
+            logging.warning('Link monitor could not reach %s:%s: %s', *self.address, e)
+            return
+        next_beat = loop.time()
+        try:
+            while not self._stopping.is_set():
+                self._send(transport)
+                next_beat += self.period
+                # Never burst to catch up after a stall
+                next_beat = max(next_beat, loop.time())
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), next_beat - loop.time())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            transport.close()
+
+    def _send(self, transport):
+        self.seq += 1
+        now = time.monotonic()
+        i = self.seq % self.window
+        self.seqs[i] = self.seq
+        self.sent_at[i] = now
+        self.rtt[i] = np.nan
+        HEARTBEAT.pack_into(self.packet, 0, MAGIC, self.seq & 0xFFFFFFFF, now)
+        transport.sendto(bytes(self.packet))
+        self.sent += 1
+
+    def _received(self, data, now):
+        if len(data) != HEARTBEAT.size:
+            return
+        magic, seq, sent_time = HEARTBEAT.unpack(data)
+        if magic != MAGIC:
+            return
+        i = seq % self.window
+        # Echoes that arrive after the timeout (or after their slot was reused) are late
+        if (self.seqs[i] & 0xFFFFFFFF) != seq or not np.isnan(self.rtt[i]) or now - sent_time > self.timeout:
+            self.late += 1
+            return
+        self.rtt[i] = now - sent_time
+        self.received += 1
+        self.last_reply = now
+
+    @property
+    def up(self):
+        return self.last_reply is not None and time.monotonic() - self.last_reply < self.timeout
+
+    def stats(self):
+        now = time.monotonic()
+        used = self.sent_at > 0
+        answered = used & ~np.isnan(self.rtt)
+        # Heartbeats still inside the timeout are neither answered nor lost yet
+        settled = answered | (used & (now - self.sent_at >= self.timeout))
+        order = np.argsort(self.seqs[answered])
+        rtt = self.rtt[answered][order]
+        n = len(rtt)
+        return {
+            'up': self.up,
+            'rtt_ms': float(rtt.mean() * 1000) if n else 0.0,
+            'rtt_p99_ms': float(np.percentile(rtt, 99) * 1000) if n else 0.0,
+            'rtt_max_ms': float(rtt.max() * 1000) if n else 0.0,
+            # Mean difference between consecutive round trips
+            'jitter_ms': float(np.abs(np.diff(rtt)).mean() * 1000) if n > 1 else 0.0,
+            'loss': float(1.0 - n / settled.sum()) if settled.any() else 0.0,
+            'sent': self.sent,
+            'received': self.received,
+            'late': self.late,
+            'errors': self.errors,
+        }
+
+    def summary(self):
+        # One line for the GUI status field
+        stats = self.stats()
+        if not stats['up']:
+            return 'down ({:.0%} loss)'.format(stats['loss'])
+        return '{:.1f} ms +/-{:.1f}, {:.0%} loss'.format(stats['rtt_ms'], stats['jitter_ms'], stats['loss'])
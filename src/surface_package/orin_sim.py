@@ -0,0 +1,248 @@
+# Local stand-in for the Orin
+#
+# Used by the tests and benchmarks so the surface side can be exercised without the AUV on
+# the bench. It can also be run on its own and the station pointed at 127.0.0.1:
+#   cd src && python -m surface_package.orin_sim
+
+import logging
+import math
+import socket
+import threading
+import time
+
+import numpy as np
+from numpysocket import NumpySocket
+
+from surface_package.telemetry import TELEMETRY_DTYPE, NUM_MOTORS, NUM_SERVOS, TelemetrySender
+from surface_package.uplink import KIND_CONTROL, KIND_START, KIND_STOP, NEUTRAL_PWM, unpack_command
+
+# One entry per command received, kept so tests and benchmarks can check what arrived
+COMMAND_LOG_DTYPE = np.dtype([
+    ('recv_time', '<f8'),
+    ('sample_time', '<f8'),
+    ('seq', '<u4'),
+    ('kind', 'u1'),
+    ('axes', '<u2', (6,)),
+    ('motors', '<u2', (NUM_MOTORS,)),
+])
+
+
+def make_telemetry(start_seq, n, t0, rate):
+    # n records of slowly varying fake telemetry starting at time t0
+    records = np.zeros(n, dtype=TELEMETRY_DTYPE)
+    seq = np.arange(start_seq, start_seq + n)
+    t = t0 + np.arange(n) / rate
+    phase = seq / 100.0
+    records['timestamp'] = t
+    records['seq'] = seq
+    records['roll'] = 10.0 * np.sin(phase)
+    records['pitch'] = 5.0 * np.cos(phase)
+    records['yaw'] = (seq * 0.1) % 360.0 - 180.0
+    records['depth'] = 2.0 + np.sin(phase / 10.0)
+    records['temperature'] = 21.5
+    records['humidity'] = 40.0
+    records['motors'] = (1500 + 200 * np.sin(phase[:, None] + np.arange(NUM_MOTORS))).astype(np.uint16)
+    records['servos'] = 1500
+    records['battery_voltage'] = 16.4
+    records['battery_current'] = 3.2
+    return records
+
+
+class OrinSimulator:
+    # Streams fake telemetry at rate Hz to whoever connects to the telemetry port. Records are
+    # sent in batches of rate / batch_rate so high sample rates don't mean one syscall each.
+    #
+    # It also listens for manual mode commands on the UDP command port. Motors only follow
+    # commands after START, STOP returns them to neutral, and the watchdog returns them to
+    # neutral whenever no command arrived for watchdog_timeout seconds.
+    #
+    # Link monitor heartbeats sent to the heartbeat port are echoed straight back, except
+    # every echo_drop_every'th one when that is set (to test loss accounting).
+    def __init__(self, host='127.0.0.1', telemetry_port=0, rate=100.0, batch_rate=100.0,
+                 command_port=0, watchdog_timeout=0.25, log_capacity=65536,
+                 heartbeat_port=0, echo_drop_every=0):
+        self.host = host
+        self.rate = rate
+        self.batch_size = max(1, int(math.ceil(rate / batch_rate)))
+        self.batch_period = self.batch_size / rate
+
+        self.server = NumpySocket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, telemetry_port))
+        self.server.listen(1)
+        self.server.settimeout(0.1)
+        self.telemetry_port = self.server.getsockname()[1]
+
+        self.command_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.command_sock.bind((host, command_port))
+        self.command_sock.settimeout(watchdog_timeout / 5)
+        self.command_port = self.command_sock.getsockname()[1]
+        self.watchdog_timeout = watchdog_timeout
+
+        self.heartbeat_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.heartbeat_sock.bind((host, heartbeat_port))
+        self.heartbeat_sock.settimeout(0.1)
+        self.heartbeat_port = self.heartbeat_sock.getsockname()[1]
+        self.echo_drop_every = echo_drop_every
+        self.heartbeats = 0
+
+        self.armed = False
+        self.motors = np.full(NUM_MOTORS, NEUTRAL_PWM, dtype=np.uint16)
+        self.servos = np.full(NUM_SERVOS, NEUTRAL_PWM, dtype=np.uint16)
+        self.last_command = None
+        self.last_seq = None
+        self.commands = 0
+        self.stale = 0
+        self.watchdog_trips = 0
+        self.command_log = np.zeros(log_capacity, dtype=COMMAND_LOG_DTYPE)
+
+        self.sent = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        for target, name in ((self._serve_telemetry, 'orin_sim_telemetry'),
+                             (self._serve_commands, 'orin_sim_commands'),
+                             (self._serve_heartbeats, 'orin_sim_heartbeats')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(2.0)
+        self._threads = []
+        self.server.close()
+        self.command_sock.close()
+        self.heartbeat_sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve_telemetry(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                self._stream(TelemetrySender(conn))
+            except OSError as e:
+                logging.debug('Orin simulator client went away: %s', e)
+            finally:
+                conn.close()
+
+    def _stream(self, sender):
+        next_batch = time.monotonic()
+        while not self._stop.is_set():
+            # The batch was sampled over the last batch period, so the newest record is "now"
+            t0 = time.time() - (self.batch_size - 1) / self.rate
+            records = make_telemetry(self.sent, self.batch_size, t0, self.rate)
+            if self.commands:
+                records['motors'] = self.motors
+                records['servos'] = self.servos
+            sender.send(records)
+            self.sent += self.batch_size
+            next_batch += self.batch_period
+            delay = next_batch - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+
+    def neutral(self):
+        self.motors[:] = NEUTRAL_PWM
+        self.servos[:] = NEUTRAL_PWM
+
+    def commands_logged(self):
+        n = min(self.commands, len(self.command_log))
+        return self.command_log[:n]
+
+    def _serve_commands(self):
+        while not self._stop.is_set():
+            try:
+                data = self.command_sock.recv(256)
+            except socket.timeout:
+                data = None
+            except OSError:
+                return
+            now = time.monotonic()
+            if data is not None:
+                self._handle_command(data, now)
+            # Watchdog: stale commands must never keep the thrusters running
+            if self.armed and self.last_command is not None and now - self.last_command > self.watchdog_timeout:
+                if np.any(self.motors != NEUTRAL_PWM) or np.any(self.servos != NEUTRAL_PWM):
+                    self.watchdog_trips += 1
+                    logging.warning('Orin simulator watchdog: no command for %.3f s', now - self.last_command)
+                self.neutral()
+
+    def _serve_heartbeats(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.heartbeat_sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self.heartbeats += 1
+            if self.echo_drop_every and self.heartbeats % self.echo_drop_every == 0:
+                continue
+            try:
+                self.heartbeat_sock.sendto(data, addr)
+            except OSError:
+                pass
+
+    def _handle_command(self, data, now):
+        command = unpack_command(data)
+        if command is None:
+            return
+        kind, seq, sent_time, sample_time, axes, buttons, motors, servos = command
+        # UDP can reorder, anything older than what we already applied is ignored. Every new
+        # uplink session starts again at seq 1 with a START, so START restarts the sequence,
+        # and STOP is never dropped whatever its seq.
+        newer = self.last_seq is None or ((seq - self.last_seq) & 0xFFFFFFFF) < 0x80000000
+        if kind == KIND_START:
+            newer = True
+        elif not newer and kind != KIND_STOP:
+            self.stale += 1
+            return
+        if newer:
+            self.last_seq = seq
+        self.last_command = now
+
+        entry = self.command_log[self.commands % len(self.command_log)]
+        entry['recv_time'] = now
+        entry['sample_time'] = sample_time
+        entry['seq'] = seq
+        entry['kind'] = kind
+        entry['axes'] = axes
+        entry['motors'] = motors
+        self.commands += 1
+
+        if kind == KIND_STOP:
+            self.armed = False
+            self.neutral()
+        elif kind == KIND_START:
+            self.armed = True
+        elif kind == KIND_CONTROL and self.armed:
+            self.motors[:] = motors
+            self.servos[:] = servos
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    orin = OrinSimulator(telemetry_port=5005, command_port=5006, heartbeat_port=5007).start()
+    logging.info('Orin simulator streaming telemetry on port %s, commands on port %s, heartbeats on port %s',
+                 orin.telemetry_port, orin.command_port, orin.heartbeat_port)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        orin.stop()
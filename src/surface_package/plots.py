@@ -0,0 +1,216 @@
+# Live rolling telemetry plots
+#
+# Roll, pitch, yaw, depth and the motor outputs are drawn as rolling time series over the
+# last plot_window seconds. Three things keep a frame cheap no matter how much data the
+# window holds:
+#   - PlotBuffer keeps one float row per channel, every sample written twice (at i and
+#     i + capacity), so the newest n samples are always a view, never a copy or a concatenate,
+#     and the per bucket min / max below reduce along contiguous memory
+#   - decimate_minmax reduces the window to the min and max of each of ~pixel width buckets,
+#     so a 60 s window at 1 kHz is drawn as 2 * buckets points and spikes are still visible
+#   - redraws are blitted: the axes, ticks and labels are rendered once into a background and
+#     every frame only restores it and repaints the line artists. The x axis is time relative
+#     to the newest sample so it never moves; a full redraw only happens when a value leaves
+#     the y limits or the canvas is resized.
+#
+# Only the GUI imports this module, so matplotlib stays out of the headless station.
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from surface_package.telemetry import NUM_MOTORS
+
+# (title, channel labels, initial y limits)
+DEFAULT_PANELS = (
+    ('Attitude (deg)', ('roll', 'pitch', 'yaw'), (-180.0, 180.0)),
+    ('Depth (m)', ('depth',), (0.0, 10.0)),
+    ('Motors (us)', tuple('m{}'.format(i + 1) for i in range(NUM_MOTORS)), (1000.0, 2000.0)),
+)
+
+
+def decimate_minmax(t, y, buckets):
+    # Reduce (n,) times and (channels, n) values to at most 2 * buckets points per channel
+    n = len(t)
+    if n <= 2 * buckets:
+        return t, y
+    k = n // buckets
+    start = n - k * buckets
+    blocks = y[:, start:].reshape(y.shape[0], buckets, k)
+    out = np.empty((y.shape[0], 2 * buckets), dtype=y.dtype)
+    np.min(blocks, axis=2, out=out[:, 0::2])
+    np.max(blocks, axis=2, out=out[:, 1::2])
+    return np.repeat(t[start::k], 2), out
+
+
+class PlotBuffer:
+    # Ring of timestamped samples, one row per channel, single writer
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.t = np.zeros(2 * capacity, dtype=np.float64)
+        self.y = np.zeros((channels, 2 * capacity), dtype=np.float32)
+        self.count = 0
+
+    def append(self, t, y):
+        # t is (n,), y is (channels, n)
+        n = len(t)
+        if n > self.capacity:
+            t, y = t[-self.capacity:], y[:, -self.capacity:]
+            self.count += n - self.capacity
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        for offset in (0, self.capacity):
+            self.t[start + offset:start + offset + first] = t[:first]
+            self.y[:, start + offset:start + offset + first] = y[:, :first]
+        if first < n:
+            rest = n - first
+            for offset in (0, self.capacity):
+                self.t[offset:offset + rest] = t[first:]
+                self.y[:, offset:offset + rest] = y[:, first:]
+        self.count += n
+
+    def latest(self, n):
+        # Views of the newest n samples, oldest first
+        n = min(n, self.count, self.capacity)
+        end = self.count % self.capacity + self.capacity
+        return self.t[end - n:end], self.y[:, end - n:end]
+
+    def window(self, seconds):
+        # Views of the samples within seconds of the newest one
+        t, y = self.latest(self.capacity)
+        if not len(t):
+            return t, y
+        start = int(np.searchsorted(t, t[-1] - seconds, side='left'))
+        return t[start:], y[:, start:]
+
+
+def telemetry_columns(records):
+    # TELEMETRY_DTYPE records to (times, (4 + NUM_MOTORS, n) values) in DEFAULT_PANELS order
+    y = np.empty((4 + NUM_MOTORS, len(records)), dtype=np.float32)
+    y[0] = records['roll']
+    y[1] = records['pitch']
+    y[2] = records['yaw']
+    y[3] = records['depth']
+    y[4:] = records['motors'].T
+    return records['timestamp'], y
+
+
+class RollingPlot:
+    # rate is the highest sample rate the buffer has to hold window seconds of, panels are
+    # laid out in a grid with the given number of columns
+    def __init__(self, figure=None, panels=DEFAULT_PANELS, window=60.0, rate=1000.0, buckets=300, columns=1):
+        if figure is None:
+            # Off screen until embed() puts it on a Tk canvas
+            figure = Figure(figsize=(3.2 * columns, 4.2 / columns), dpi=100)
+            FigureCanvasAgg(figure)
+        self.figure = figure
+        self.window = window
+        self.buckets = buckets
+        self.buffer = PlotBuffer(int(window * rate * 1.1) + 1, sum(len(p[1]) for p in panels))
+        # Telemetry ring count already copied into the buffer
+        self.seen = 0
+
+        self.axes = []
+        self.lines = []
+        self.columns = []
+        column = 0
+        rows = -(-len(panels) // columns)
+        for i, (title, labels, ylim) in enumerate(panels):
+            ax = self.figure.add_subplot(rows, columns, i + 1)
+            ax.set_title(title, fontsize=8, loc='left')
+            ax.set_xlim(-window, 0.0)
+            ax.set_ylim(*ylim)
+            ax.tick_params(labelsize=7)
+            lines = [ax.plot([], [], linewidth=0.8, label=label, animated=True)[0] for label in labels]
+            self.axes.append(ax)
+            self.lines.append(lines)
+            self.columns.append(slice(column, column + len(labels)))
+            column += len(labels)
+        self.figure.tight_layout()
+
+        self.backgrounds = None
+        self.figure.canvas.mpl_connect('draw_event', self._on_draw)
+
+        # Metrics
+        self.frames = 0
+        self.full_redraws = 0
+        self.points = 0
+
+    def attach(self, canvas):
+        # Called after the figure was put on a new canvas (e.g. FigureCanvasTkAgg). The
+        # draw_event connection lives on the figure, so only the backgrounds are stale.
+        self.backgrounds = None
+
+    def _on_draw(self, event):
+        # Every full draw (first frame, resize, rescale) refreshes the blit backgrounds
+        canvas = self.figure.canvas
+        self.backgrounds = [canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        self._draw_lines()
+
+    def append(self, t, y):
+        self.buffer.append(t, y)
+
+    def feed(self, ring):
+        # Copy whatever arrived in a TelemetryRing since the last call
+        if ring.count == self.seen:
+            return 0
+        records = ring.since(self.seen)
+        self.seen = ring.count
+        self.append(*telemetry_columns(records))
+        return len(records)
+
+    def _update_lines(self):
+        t, y = self.buffer.window(self.window)
+        if not len(t):
+            return False
+        t, y = decimate_minmax(t, y, self.buckets)
+        x = t - t[-1]
+        rescale = False
+        for ax, lines, columns in zip(self.axes, self.lines, self.columns):
+            values = y[columns]
+            for line, row in zip(lines, values):
+                line.set_data(x, row)
+            low, high = ax.get_ylim()
+            vmin, vmax = float(values.min()), float(values.max())
+            if vmin < low or vmax > high:
+                margin = 0.1 * (max(vmax, high) - min(vmin, low))
+                ax.set_ylim(min(vmin, low) - margin, max(vmax, high) + margin)
+                rescale = True
+        self.points = len(x)
+        return rescale
+
+    def _draw_lines(self):
+        for ax, lines in zip(self.axes, self.lines):
+            for line in lines:
+                ax.draw_artist(line)
+
+    def draw(self):
+        rescale = self._update_lines()
+        canvas = self.figure.canvas
+        if self.backgrounds is None or rescale:
+            # draw_event recaptures the backgrounds and paints the lines
+            canvas.draw()
+            self.full_redraws += 1
+        else:
+            for background in self.backgrounds:
+                canvas.restore_region(background)
+            self._draw_lines()
+            for ax in self.axes:
+                canvas.blit(ax.bbox)
+        self.frames += 1
+
+    def stats(self):
+        return {'frames': self.frames, 'full_redraws': self.full_redraws, 'points': self.points,
+                'samples': self.buffer.count}
+
+
+def embed(plot, tk_canvas):
+    # Put the plot's figure on a Tk canvas (the TKCanvas of a PySimpleGUI Canvas element)
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    canvas = FigureCanvasTkAgg(plot.figure, tk_canvas)
+    canvas.get_tk_widget().pack(side='top', fill='both', expand=1)
+    plot.attach(canvas)
+    canvas.draw()
+    return canvas
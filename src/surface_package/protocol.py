@@ -0,0 +1,273 @@
+# Binary framing for the Arduino controller link (see arduino/AUV/AUV.ino)
+#
+# Frame layout, little endian, 19 bytes:
+#   0  sync     2 bytes  0xA5 0x5A
+#   2  seq      1 byte   wraps at 256, used to count lost frames
+#   3  axes     6 x u16  raw analogRead() values (0 - 1023)
+#   15 buttons  u16      bit i set means button i + 1 is pressed
+#   17 crc      u16      CRC-16 (AVR _crc_ccitt_update, init 0xFFFF) over bytes 2 - 16
+#
+# The legacy ASCII format ("512,512,...,True,False,...\n") is still accepted so old
+# firmware keeps working.
+
+import struct
+
+import numpy as np
+
+from surface_package.controller import NUM_AXES, NUM_BUTTONS
+
+SYNC = b'\xa5\x5a'
+FRAME_SIZE = 19
+PAYLOAD_START = 2
+PAYLOAD_END = 17
+
+PAYLOAD_STRUCT = struct.Struct('<B6HH')
+
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('seq', 'u1'),
+    ('axes', '<u2', (NUM_AXES,)),
+    ('buttons', '<u2'),
+    ('crc', '<u2'),
+])
+
+# Decoded samples, one record per frame (or per legacy line)
+SAMPLE_DTYPE = np.dtype([
+    ('seq', 'u1'),
+    ('axes', '<u2', (NUM_AXES,)),
+    ('buttons', '<u2'),
+])
+
+# Keep at most this many undecodable bytes around while waiting for a newline or sync
+MAX_PENDING = 4096
+
+# Below this many buffered bytes frames are decoded with struct, above it with NumPy
+VECTOR_THRESHOLD = 16 * FRAME_SIZE
+
+_EMPTY = np.empty(0, dtype=SAMPLE_DTYPE)
+_FRAME_OFFSETS = np.arange(FRAME_SIZE)
+_LEGACY_FIELDS = NUM_AXES + NUM_BUTTONS
+
+
+def _make_crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8408 if crc & 1 else crc >> 1
+        table[i] = crc
+    return table
+
+
+CRC_TABLE = _make_crc_table()
+_CRC_TABLE_LIST = CRC_TABLE.tolist()
+
+
+def crc16(data):
+    # Same result as looping _crc_ccitt_update() on the Arduino
+    crc = 0xFFFF
+    table = _CRC_TABLE_LIST
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_rows(rows):
+    # Vectorized crc16 over every row of a (N, L) uint8 array
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for column in rows.T:
+        crc = (crc >> 8) ^ CRC_TABLE[(crc ^ column) & 0xFF]
+    return crc
+
+
+def encode_frame(seq, axes, buttons):
+    payload = PAYLOAD_STRUCT.pack(seq & 0xFF, *axes, buttons & 0x3FF)
+    return SYNC + payload + struct.pack('<H', crc16(payload))
+
+
+def encode_frames(samples):
+    # Encode a SAMPLE_DTYPE array into one contiguous byte string
+    frames = np.zeros(len(samples), dtype=FRAME_DTYPE)
+    frames['sync'] = 0x5AA5
+    frames['seq'] = samples['seq']
+    frames['axes'] = samples['axes']
+    frames['buttons'] = samples['buttons'] & 0x3FF
+    rows = frames.view(np.uint8).reshape(-1, FRAME_SIZE)
+    frames['crc'] = crc16_rows(rows[:, PAYLOAD_START:PAYLOAD_END])
+    return frames.tobytes()
+
+
+def encode_legacy_line(axes, buttons):
+    # The ASCII line the original AUV.ino printed
+    fields = [str(int(v)) for v in axes]
+    fields += ['True' if buttons & (1 << i) else 'False' for i in range(NUM_BUTTONS)]
+    return (','.join(fields) + '\r\n').encode('ascii')
+
+
+def parse_legacy_line(line):
+    # Returns (axes, button_mask) or None if the line is not a valid legacy sample
+    values = line.strip().split(b',')
+    if len(values) != _LEGACY_FIELDS:
+        return None
+    try:
+        axes = [int(float(v)) for v in values[:NUM_AXES]]
+    except ValueError:
+        return None
+    mask = 0
+    for i, val in enumerate(values[NUM_AXES:]):
+        val = val.strip()
+        if val == b'True':
+            mask |= 1 << i
+        elif val != b'False':
+            return None
+    return axes, mask
+
+
+class FrameDecoder:
+    # Incremental decoder: feed() it whatever the serial port returned and it hands back
+    # every complete sample as a SAMPLE_DTYPE array. Corrupt or partial data is skipped
+    # by searching for the next sync word whose CRC checks out.
+    def __init__(self, mode=None):
+        # mode is 'binary', 'legacy' or None to detect it from the first valid sample
+        self.mode = mode
+        self.buffer = bytearray()
+        self.last_seq = None
+        self.frames = 0
+        self.lost = 0
+        self.crc_errors = 0
+        self.skipped_bytes = 0
+
+    def reset(self):
+        self.buffer.clear()
+        self.last_seq = None
+
+    def feed(self, data):
+        self.buffer += data
+        samples = _EMPTY
+        if self.mode != 'legacy':
+            samples = self._decode_binary()
+            if len(samples):
+                self.mode = 'binary'
+        if self.mode != 'binary' and not len(samples):
+            samples = self._decode_legacy()
+            if len(samples):
+                self.mode = 'legacy'
+        if len(self.buffer) > MAX_PENDING:
+            drop = len(self.buffer) - MAX_PENDING
+            del self.buffer[:drop]
+            self.skipped_bytes += drop
+        if len(samples):
+            self._count_lost(samples['seq'])
+        return samples
+
+    def _count_lost(self, seq):
+        count = len(seq)
+        self.frames += count
+        if self.mode == 'legacy':
+            return
+        last = int(seq[-1])
+        prev = self.last_seq if self.last_seq is not None else int(seq[0]) - 1
+        # Counted modulo 256 per batch, which is plenty between two serial reads
+        self.lost += (last - prev - count) % 256
+        self.last_seq = last
+
+    def _decode_binary(self):
+        buf = self.buffer
+        size = len(buf)
+        if size < FRAME_SIZE:
+            return _EMPTY
+        if size < VECTOR_THRESHOLD:
+            return self._decode_binary_small()
+        raw = np.frombuffer(buf, dtype=np.uint8)
+        starts = np.flatnonzero((raw[:-1] == 0xA5) & (raw[1:] == 0x5A))
+        starts = starts[starts <= size - FRAME_SIZE]
+        if len(starts) == 0:
+            # Nothing that could be a full frame; keep the tail in case a sync is split
+            keep_from = size - (FRAME_SIZE - 1)
+            if self.mode == 'binary' and keep_from > 0:
+                del raw
+                del buf[:keep_from]
+                self.skipped_bytes += keep_from
+            return _EMPTY
+
+        rows = raw[starts[:, None] + _FRAME_OFFSETS]
+        frames = rows.view(FRAME_DTYPE).ravel()
+        valid = crc16_rows(rows[:, PAYLOAD_START:PAYLOAD_END]) == frames['crc']
+        self.crc_errors += int(len(valid) - np.count_nonzero(valid))
+        good = starts[valid]
+        frames = frames[valid]
+
+        # A sync pattern inside a real frame can pass the CRC by chance, so drop overlaps
+        if len(good) > 1 and np.any(np.diff(good) < FRAME_SIZE):
+            keep = np.zeros(len(good), dtype=bool)
+            end = -1
+            for i, start in enumerate(good.tolist()):
+                if start >= end:
+                    keep[i] = True
+                    end = start + FRAME_SIZE
+            good = good[keep]
+            frames = frames[keep]
+
+        samples = np.empty(len(frames), dtype=SAMPLE_DTYPE)
+        samples['seq'] = frames['seq']
+        samples['axes'] = frames['axes']
+        samples['buttons'] = frames['buttons']
+
+        last_end = int(good[-1]) + FRAME_SIZE if len(good) else 0
+        consumed = max(last_end, size - (FRAME_SIZE - 1))
+        if self.mode != 'binary' and len(good) == 0:
+            # Still detecting the format, leave the bytes for the legacy parser
+            return samples
+        self.skipped_bytes += consumed - len(good) * FRAME_SIZE
+        del raw, rows
+        del buf[:consumed]
+        return samples
+
+    def _decode_binary_small(self):
+        # Same as _decode_binary but cheaper for the few frames a single serial read returns
+        buf = self.buffer
+        size = len(buf)
+        unpack = PAYLOAD_STRUCT.unpack_from
+        decoded = []
+        pos = buf.find(SYNC)
+        last_end = 0
+        while 0 <= pos <= size - FRAME_SIZE:
+            end = pos + PAYLOAD_END
+            if crc16(buf[pos + PAYLOAD_START:end]) == buf[end] | (buf[end + 1] << 8):
+                decoded.append(unpack(buf, pos + PAYLOAD_START))
+                last_end = pos + FRAME_SIZE
+                pos = buf.find(SYNC, last_end)
+            else:
+                self.crc_errors += 1
+                pos = buf.find(SYNC, pos + 1)
+        if not decoded and self.mode != 'binary':
+            return _EMPTY
+        consumed = max(last_end, size - (FRAME_SIZE - 1))
+        self.skipped_bytes += consumed - len(decoded) * FRAME_SIZE
+        del buf[:consumed]
+        samples = np.empty(len(decoded), dtype=SAMPLE_DTYPE)
+        if decoded:
+            samples['seq'] = [d[0] for d in decoded]
+            samples['axes'] = [d[1:7] for d in decoded]
+            samples['buttons'] = [d[7] for d in decoded]
+        return samples
+
+    def _decode_legacy(self):
+        buf = self.buffer
+        end = buf.rfind(b'\n')
+        if end < 0:
+            return _EMPTY
+        lines = bytes(buf[:end]).split(b'\n')
+        del buf[:end + 1]
+        parsed = []
+        for line in lines:
+            sample = parse_legacy_line(line)
+            if sample is None:
+                self.skipped_bytes += len(line) + 1
+            else:
+                parsed.append(sample)
+        samples = np.zeros(len(parsed), dtype=SAMPLE_DTYPE)
+        if parsed:
+            samples['axes'] = [axes for axes, _ in parsed]
+            samples['buttons'] = [mask for _, mask in parsed]
+        return samples
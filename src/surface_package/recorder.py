@@ -0,0 +1,329 @@
+# Flight recorder and replay
+#
+# A recording is a directory with one set of files per stream (controller, commands,
+# telemetry, ...):
+#   <stream>.00000.npy   fixed size segments of records, written through np.memmap
+#   <stream>.index       (t, record number) every index_stride records, for seeking
+#   <stream>.json        dtype and record count, written when the stream is closed
+# Every record is wrapped as (t, data) where t is time.time() when it was recorded, so all
+# streams share one clock no matter where the data came from. Records that carry their own
+# 'timestamp' (telemetry batches) are spread back from t by their timestamp differences, so
+# replay keeps the spacing inside a batch. t never goes back, not even when the wall clock
+# steps backwards, since seek() and replay rely on it being sorted.
+#
+# Appending is a copy into the mapped segment, cheap enough to do from the threads that
+# produce the data. Reading maps segments on demand, so an hour long dive is never read
+# into memory as a whole.
+
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+INDEX_DTYPE = np.dtype([('t', '<f8'), ('record', '<i8')])
+SEGMENT_RECORDS = 1 << 16
+INDEX_STRIDE = 256
+
+
+def record_dtype(dtype):
+    return np.dtype([('t', '<f8'), ('data', dtype)])
+
+
+def _segment_path(directory, name, segment):
+    return os.path.join(directory, '{}.{:05d}.npy'.format(name, segment))
+
+
+class StreamWriter:
+    def __init__(self, directory, name, dtype, segment_records=SEGMENT_RECORDS, index_stride=INDEX_STRIDE):
+        self.directory = directory
+        self.name = name
+        self.dtype = record_dtype(dtype)
+        self.segment_records = segment_records
+        self.index_stride = index_stride
+
+        self.count = 0
+        self.last_t = 0.0
+        # Batches of a dtype with a timestamp field are stamped per record
+        self.stamped = 'timestamp' in (np.dtype(dtype).names or ())
+        self.segment = -1
+        self.position = 0
+        self.memmap = None
+        self.lock = threading.Lock()
+        self.index = open(os.path.join(directory, name + '.index'), 'ab')
+        self.index_entry = np.zeros(1, dtype=INDEX_DTYPE)
+        self.closed = False
+        self._next_segment()
+
+    def _next_segment(self):
+        if self.memmap is not None:
+            self.memmap.flush()
+        self.segment += 1
+        self.position = 0
+        self.memmap = np.lib.format.open_memmap(_segment_path(self.directory, self.name, self.segment),
+                                                mode='w+', dtype=self.dtype, shape=(self.segment_records,))
+
+    def append(self, records, t=None):
+        # records is an array (or a single record) of the stream's data dtype
+        if t is None:
+            t = time.time()
+        records = np.atleast_1d(records)
+        with self.lock:
+            if self.closed:
+                return
+            done = 0
+            n = len(records)
+            times = None
+            if self.stamped and n > 1:
+                # The newest record is at t, never before anything already written
+                stamps = records['timestamp']
+                times = t - (stamps[-1] - stamps)
+                times[0] = max(times[0], self.last_t)
+                np.maximum.accumulate(times, out=times)
+                self.last_t = float(times[-1])
+            else:
+                t = max(t, self.last_t)
+                self.last_t = t
+            while done < n:
+                if self.position == self.segment_records:
+                    self._next_segment()
+                take = min(n - done, self.segment_records - self.position)
+                rows = self.memmap[self.position:self.position + take]
+                rows['t'] = t if times is None else times[done:done + take]
+                rows['data'] = records[done:done + take]
+                # Index the first record of every stride that this write crossed into
+                first = self.count
+                last = self.count + take
+                mark = -(-first // self.index_stride) * self.index_stride
+                if mark < last:
+                    for record in range(mark, last, self.index_stride):
+                        self.index_entry['t'] = t if times is None else times[done + record - first]
+                        self.index_entry['record'] = record
+                        self.index.write(self.index_entry.tobytes())
+                self.position += take
+                self.count += take
+                done += take
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.memmap.flush()
+            self.memmap = None
+            self.index.close()
+            manifest = {
+                'dtype': np.lib.format.dtype_to_descr(self.dtype),
+                'count': self.count,
+                'segment_records': self.segment_records,
+                'segments': self.segment + 1,
+            }
+            with open(os.path.join(self.directory, self.name + '.json'), 'w') as f:
+                json.dump(manifest, f)
+
+
+class Recorder:
+    # One directory per recording, one StreamWriter per stream
+    def __init__(self, root='logs/recordings', name=None, segment_records=SEGMENT_RECORDS):
+        if name is None:
+            name = time.strftime('%Y%m%d-%H%M%S')
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        self.segment_records = segment_records
+        self.streams = {}
+        logging.info('Recording to %s', self.path)
+
+    def stream(self, name, dtype):
+        if name not in self.streams:
+            self.streams[name] = StreamWriter(self.path, name, dtype, segment_records=self.segment_records)
+        return self.streams[name]
+
+    def close(self):
+        for writer in self.streams.values():
+            writer.close()
+
+    def stats(self):
+        return {name: writer.count for name, writer in self.streams.items()}
+
+
+class RecordedStream:
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        manifest_path = os.path.join(directory, name + '.json')
+        self.segments = []
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.dtype = np.lib.format.descr_to_dtype(manifest['dtype'])
+            self.count = manifest['count']
+            self.segment_records = manifest['segment_records']
+            self.segments = [None] * manifest['segments']
+        else:
+            # The recorder did not close cleanly, recover what the index and segments say
+            self._recover()
+        index_path = os.path.join(directory, name + '.index')
+        self.index = np.fromfile(index_path, dtype=INDEX_DTYPE) if os.path.exists(index_path) else np.zeros(0, INDEX_DTYPE)
+
+    def _recover(self):
+        segment = 0
+        while os.path.exists(_segment_path(self.directory, self.name, segment)):
+            segment += 1
+        self.segments = [None] * segment
+        last = self._segment(segment - 1)
+        self.dtype = last.dtype
+        self.segment_records = len(last)
+        # Unwritten records are all zero, and every written record has t > 0
+        used = int(np.searchsorted(-np.sign(last['t']), 0))
+        self.count = (segment - 1) * self.segment_records + used
+
+    def _segment(self, segment):
+        mapped = self.segments[segment]
+        if mapped is None:
+            mapped = np.load(_segment_path(self.directory, self.name, segment), mmap_mode='r')
+            self.segments[segment] = mapped
+        return mapped
+
+    def __len__(self):
+        return self.count
+
+    def read(self, start, stop):
+        # Copy of records [start, stop), only the touched pages are read from disk
+        start = max(0, start)
+        stop = min(stop, self.count)
+        if stop <= start:
+            return np.zeros(0, dtype=self.dtype)
+        parts = []
+        while start < stop:
+            segment, offset = divmod(start, self.segment_records)
+            take = min(stop - start, self.segment_records - offset)
+            parts.append(self._segment(segment)[offset:offset + take])
+            start += take
+        return parts[0].copy() if len(parts) == 1 else np.concatenate(parts)
+
+    def time_at(self, record):
+        segment, offset = divmod(record, self.segment_records)
+        return float(self._segment(segment)['t'][offset])
+
+    def seek(self, t):
+        # Number of the first record at or after time t
+        if self.count == 0:
+            return 0
+        # The index narrows it down to one stride, then a search inside that stride
+        i = int(np.searchsorted(self.index['t'], t, side='left'))
+        lo = int(self.index['record'][i - 1]) if i > 0 else 0
+        hi = int(self.index['record'][i]) if i < len(self.index) else self.count
+        hi = min(hi, self.count)
+        while lo < hi:
+            segment, offset = divmod(lo, self.segment_records)
+            end = min(hi - lo, self.segment_records - offset)
+            times = self._segment(segment)['t'][offset:offset + end]
+            j = int(np.searchsorted(times, t, side='left'))
+            if j < len(times):
+                return lo + j
+            lo += end
+        return hi
+
+    def time_range(self):
+        if self.count == 0:
+            return (0.0, 0.0)
+        return (self.time_at(0), self.time_at(self.count - 1))
+
+
+class Recording:
+    def __init__(self, path):
+        self.path = path
+        names = sorted({f.split('.')[0] for f in os.listdir(path) if f.endswith('.npy')})
+        self.streams = {name: RecordedStream(path, name) for name in names}
+
+    def __getitem__(self, name):
+        return self.streams[name]
+
+    def time_range(self):
+        ranges = [s.time_range() for s in self.streams.values() if len(s)]
+        if not ranges:
+            return (0.0, 0.0)
+        return (min(r[0] for r in ranges), max(r[1] for r in ranges))
+
+
+class Player:
+    # Plays a recording back in time order. Every chunk of records is handed to the sink for
+    # its stream: sinks[name](records) gets the unwrapped data array. speed is a multiple of
+    # real time, None plays as fast as the sinks accept the data.
+    def __init__(self, recording, sinks, speed=1.0, start=None, chunk_period=0.01, max_chunk=4096):
+        self.recording = recording
+        self.sinks = sinks
+        self.speed = speed
+        self.chunk_period = chunk_period
+        self.max_chunk = max_chunk
+        t0, t1 = recording.time_range()
+        self.start_time = t0 if start is None else start
+        self.end_time = t1
+        self.position = self.start_time
+        self.played = {name: 0 for name in sinks}
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='replay', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {'position': self.position - self.start_time, 'played': dict(self.played)}
+
+    def run(self):
+        streams = {name: self.recording[name] for name in self.sinks if name in self.recording.streams}
+        cursors = {name: stream.seek(self.start_time) for name, stream in streams.items()}
+        wall_start = time.monotonic()
+        window = self.start_time
+        step = self.chunk_period * (self.speed if self.speed else 100.0)
+        while not self._stop.is_set():
+            window += step
+            pending = False
+            for name, stream in streams.items():
+                cursor = cursors[name]
+                stop = min(stream.seek(window), cursor + self.max_chunk)
+                if stop > cursor:
+                    records = stream.read(cursor, stop)
+                    self.sinks[name](records['data'])
+                    self.played[name] += stop - cursor
+                    cursors[name] = stop
+                pending = pending or stop < len(stream)
+            self.position = min(window, self.end_time)
+            if not pending and window >= self.end_time:
+                break
+            if self.speed:
+                delay = wall_start + (window - self.start_time) / self.speed - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+        self.finished.set()
+
+
+if __name__ == '__main__':
+    # Headless replay: play a recording through counting sinks and report how fast it went
+    #   cd src && python -m surface_package.recorder ../logs/recordings/<name> [speed|max]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    recording = Recording(sys.argv[1])
+    speed = None if len(sys.argv) > 2 and sys.argv[2] == 'max' else float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    t0, t1 = recording.time_range()
+    for name, stream in recording.streams.items():
+        logging.info('%s: %d records', name, len(stream))
+    player = Player(recording, {name: (lambda records: None) for name in recording.streams}, speed=speed)
+    start = time.perf_counter()
+    player.run()
+    elapsed = time.perf_counter() - start
+    logging.info('Replayed %.1f s of data in %.3f s (%.1fx): %s', t1 - t0, elapsed,
+                 (t1 - t0) / elapsed if elapsed else 0.0, player.stats()['played'])
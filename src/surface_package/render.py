@@ -0,0 +1,119 @@
+# Rate limited GUI updates
+#
+# Telemetry can arrive hundreds of times a second but the operator only needs to see it
+# at the screen refresh rate. update() merges values into a dirty set from any thread and
+# flush(), called from the GUI loop, pushes only the widgets whose formatted value changed,
+# at most fps times a second.
+
+import threading
+import time
+
+
+def format_float(value):
+    return '{:.1f}'.format(value)
+
+
+def format_percent(value):
+    # ProgressBar elements take an integer count out of 100
+    return max(0, min(100, int(round(value))))
+
+
+class RenderScheduler:
+    def __init__(self, window, fps=30.0):
+        self.window = window
+        self.fps = fps
+        self.frame_period = 1.0 / fps if fps else 0.0
+
+        # key -> (element, formatter, is_progress)
+        self.widgets = {}
+        self.rendered = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_frame = 0.0
+
+        # Metrics
+        self.frames = 0
+        self.received = 0
+        self.coalesced = 0
+        self.pushed = 0
+        self.skipped = 0
+        self.queued = 0
+        self.frame_time = 0.0
+        self.max_frame_time = 0.0
+
+    @property
+    def timeout_ms(self):
+        # What to pass to window.read() so the loop wakes up once per frame
+        return max(1, int(self.frame_period * 1000))
+
+    def register(self, key, formatter=str, progress=False):
+        self.widgets[key] = (self.window[key], formatter, progress)
+
+    def update(self, key, value):
+        with self.lock:
+            if key in self.pending:
+                self.coalesced += 1
+            self.pending[key] = value
+            self.received += 1
+
+    def update_many(self, values):
+        with self.lock:
+            pending = self.pending
+            before = len(pending)
+            pending.update(values)
+            self.coalesced += before + len(values) - len(pending)
+            self.received += len(values)
+
+    def flush(self, now=None, force=False):
+        # Push pending values to the window, returns the number of widgets updated
+        if now is None:
+            now = time.monotonic()
+        if not force and now - self.last_frame < self.frame_period:
+            return 0
+        with self.lock:
+            if not self.pending:
+                return 0
+            pending, self.pending = self.pending, {}
+        self.last_frame = now
+
+        start = time.perf_counter()
+        widgets = self.widgets
+        rendered = self.rendered
+        pushed = 0
+        for key, value in pending.items():
+            widget = widgets.get(key)
+            if widget is None:
+                continue
+            element, formatter, progress = widget
+            shown = formatter(value)
+            if rendered.get(key) == shown:
+                continue
+            if progress:
+                element.update(current_count=shown)
+            else:
+                element.update(value=shown)
+            rendered[key] = shown
+            pushed += 1
+        elapsed = time.perf_counter() - start
+
+        self.frames += 1
+        self.queued = len(pending)
+        self.pushed += pushed
+        self.skipped += len(pending) - pushed
+        self.frame_time = elapsed
+        if elapsed > self.max_frame_time:
+            self.max_frame_time = elapsed
+        return pushed
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'received': self.received,
+            'coalesced': self.coalesced,
+            'pushed': self.pushed,
+            'skipped': self.skipped,
+            'queued': self.queued,
+            'pending': len(self.pending),
+            'frame_time_ms': self.frame_time * 1000,
+            'max_frame_time_ms': self.max_frame_time * 1000,
+        }
@@ -0,0 +1,206 @@
+# Background reader for the Arduino controller link
+#
+# The reader thread drains the serial port in bulk, decodes it with FrameDecoder and
+# publishes only the newest sample into a LatestState. The GUI and the uplink read that
+# slot whenever they need it, so nothing ever waits on the serial port.
+
+import logging
+import threading
+import time
+
+import numpy as np
+import serial
+
+from surface_package.controller import apply_sample
+from surface_package.protocol import FRAME_SIZE, FrameDecoder
+
+STATE_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('seq', 'u1'),
+    ('axes', '<u2', (6,)),
+    ('buttons', '<u2'),
+])
+
+# analogRead value of a centered stick
+CENTER_AXIS = 512
+
+
+class LatestState:
+    # Single slot seqlock: the writer makes the version odd while it copies the sample in,
+    # readers retry if the version was odd or changed while they copied it out. There is
+    # only ever one writer (the reader thread), so no lock is needed on either side.
+    # Until the first publish the sticks read centered with timestamp 0.
+    def __init__(self):
+        self.slot = np.zeros(1, dtype=STATE_DTYPE)
+        self.slot['axes'] = CENTER_AXIS
+        self.version = 0
+
+    def publish(self, seq, axes, buttons, timestamp):
+        self.version += 1
+        slot = self.slot
+        slot['timestamp'] = timestamp
+        slot['seq'] = seq
+        slot['axes'] = axes
+        slot['buttons'] = buttons
+        self.version += 1
+
+    def read(self, out=None):
+        # Copy the newest sample into out (a STATE_DTYPE array of length 1) and return it
+        if out is None:
+            out = np.zeros(1, dtype=STATE_DTYPE)
+        while True:
+            version = self.version
+            if version & 1:
+                continue
+            out[...] = self.slot
+            if self.version == version:
+                return out
+
+    def read_controller(self, controller):
+        # Update a Controller from the newest sample, returns the sample timestamp
+        sample = self.read()[0]
+        apply_sample(controller, sample['axes'], sample['buttons'])
+        return float(sample['timestamp'])
+
+    @property
+    def count(self):
+        return self.version // 2
+
+
+class SerialReader:
+    def __init__(self, port, baudrate, timeout=0.1, sample_rate=100.0, max_backlog=4096,
+                 reconnect_interval=1.0, serial_factory=serial.Serial, state=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        # How often the port is polled when nothing is waiting
+        self.sample_rate = sample_rate
+        # If more than this many bytes are waiting we are too far behind to catch up, so the
+        # stale bytes are flushed instead of decoded
+        self.max_backlog = max_backlog
+        self.reconnect_interval = reconnect_interval
+        self.serial_factory = serial_factory
+
+        # Pass a state in to keep the same slot across reconnects to a different port
+        self.state = state if state is not None else LatestState()
+        self.decoder = FrameDecoder()
+        self.ser = None
+        self.connected = False
+        # Optional recorder StreamWriter, every published sample is appended to it
+        self.recorder = None
+        # Optional instrument StageTimer, times decoding and publishing each read
+        self.timer = None
+
+        # Counters, only written by the reader thread
+        self.bytes_read = 0
+        self.reads = 0
+        self.dropped = 0
+        self.overruns = 0
+        self.reconnects = 0
+        self.errors = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='serial_reader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'samples': self.state.count,
+            'frames': self.decoder.frames,
+            'lost': self.decoder.lost,
+            'crc_errors': self.decoder.crc_errors,
+            'skipped_bytes': self.decoder.skipped_bytes,
+            'bytes_read': self.bytes_read,
+            'dropped': self.dropped,
+            'overruns': self.overruns,
+            'reconnects': self.reconnects,
+            'errors': self.errors,
+        }
+
+    def _open(self):
+        # The poll period doubles as the read timeout so stop() is noticed quickly. A timeout of
+        # 0 would open the port non blocking and spin the thread, so it waits a period instead.
+        period = 1.0 / self.sample_rate if self.sample_rate else self.timeout
+        timeout = min(self.timeout, period) if self.timeout else period
+        self.ser = self.serial_factory(self.port, self.baudrate, timeout=timeout)
+        self.decoder.reset()
+        self.connected = True
+        logging.info('Serial reader connected to %s', self.port)
+
+    def _close(self):
+        self.connected = False
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            self.ser = None
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            if self.ser is None:
+                try:
+                    self._open()
+                    if not first:
+                        self.reconnects += 1
+                    first = False
+                except (serial.SerialException, OSError) as e:
+                    logging.debug('Serial reader could not open %s: %s', self.port, e)
+                    self._stop.wait(self.reconnect_interval)
+                    continue
+            try:
+                self._read_once()
+            except (serial.SerialException, OSError) as e:
+                # Unplugged or the port went away, keep trying to reopen it
+                logging.warning('Serial reader lost %s: %s', self.port, e)
+                self.errors += 1
+                self._close()
+                self._stop.wait(self.reconnect_interval)
+
+    def _read_once(self):
+        ser = self.ser
+        waiting = ser.in_waiting
+        if waiting > self.max_backlog:
+            # Backpressure: drop everything but the newest max_backlog bytes
+            stale = waiting - self.max_backlog
+            ser.read(stale)
+            self.overruns += 1
+            self.decoder.reset()
+            waiting -= stale
+        data = ser.read(waiting if waiting else FRAME_SIZE)
+        if not data:
+            return
+        self.reads += 1
+        self.bytes_read += len(data)
+        timer = self.timer
+        if timer is not None:
+            t0 = time.perf_counter()
+            c0 = time.thread_time()
+        samples = self.decoder.feed(data)
+        count = len(samples)
+        if count:
+            latest = samples[-1]
+            self.state.publish(latest['seq'], latest['axes'], latest['buttons'], time.monotonic())
+            self.dropped += count - 1
+            if self.recorder is not None:
+                self.recorder.append(self.state.slot)
+        if timer is not None:
+            timer.stop(t0, c0)
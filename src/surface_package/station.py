@@ -0,0 +1,378 @@
+# Headless surface station core
+#
+# StationCore owns everything that talks to hardware or the network: the config, the serial
+# reader, the mixer, the telemetry receiver, the command uplink, the flight recorder and
+# replay. It never imports PySimpleGUI or matplotlib, so it starts fast and runs under CI or
+# on a machine without a display. The GUI in src/main.py is just one subscriber: poll()
+# hands every subscriber a mapping of display key to value whenever something changed.
+
+import logging
+import time
+
+from surface_package.config import CONFIG_PATH, SETTINGS, ConfigWatcher, integer, load_config, number
+from surface_package.instrument import Instruments
+from surface_package.link_monitor import LinkMonitor
+from surface_package.recorder import Player, Recorder, Recording
+from surface_package.serial_reader import STATE_DTYPE, LatestState, SerialReader
+from surface_package.telemetry import TELEMETRY_DTYPE, TelemetryReceiver, TelemetryRing
+from surface_package.uplink import COMMAND_DTYPE, CommandUplink
+
+MOTOR_KEYS = tuple('motor{}_progress'.format(i + 1) for i in range(8))
+SERVO_KEYS = tuple('servo{}_progress'.format(i + 1) for i in range(3))
+
+# Settings that only take effect the next time the link they belong to is (re)connected
+SERIAL_SETTINGS = ('arduino_serial_port', 'arduino_baudrate', 'arduino_timeout', 'arduino_sample_rate')
+TELEMETRY_SETTINGS = ('telemetry_port',)
+
+# Settings apply_config switches to mid run. Anything in neither list (the Orin address, the
+# recorder, the GUI and plot settings, ...) is read once at startup and needs a restart.
+LIVE_SETTINGS = (
+    'motor_speed_min', 'motor_speed_max', 'motor_trim',
+    'servo_1_min', 'servo_1_max', 'servo_2_min', 'servo_2_max', 'servo_3_min', 'servo_3_max', 'servo_buttons',
+    'mixer_deadband', 'mixer_expo', 'mixer_matrix', 'mixer_axis_dof', 'mixer_axis_invert',
+    'command_rate', 'command_stale_timeout', 'heartbeat_port', 'heartbeat_rate', 'stats_interval',
+)
+
+
+class StationCore:
+    # config is a StationConfig, if it is not given it is loaded from config_path and the file
+    # is watched for changes. replay is the path of a recording to play back instead of
+    # talking to the hardware, speed is a multiple of real time (None for as fast as possible).
+    # instruments replaces the default Instruments (e.g. with a bigger capacity for benchmarks).
+    def __init__(self, config=None, config_path=CONFIG_PATH, replay=None, speed=1.0, instruments=None):
+        self.config = config if config is not None else load_config(config_path)
+        self.config_path = config_path if config is None else None
+        self.watcher = None
+        # The newest config from the watcher thread, poll() applies it on the core's own thread
+        self.pending_config = None
+        self.applied_config = None
+        self.replay_path = replay
+        self.replay_speed = speed
+
+        # The newest controller sample lives here no matter which port the reader is connected to
+        self.controller_state = LatestState()
+        self.serial_reader = None
+
+        # Telemetry from the Orin is received on a background thread once connected
+        self.telemetry = None
+        self.telemetry_ring = None
+
+        # The flight recorder keeps controller input, sent commands and telemetry for post dive analysis
+        self.recorder = None
+        self.replay = None
+
+        # Manual mode commands go to the Orin over UDP once the sub is started
+        self.uplink = None
+
+        # Round trip time, jitter and loss to the Orin, measured continuously in the background
+        self.link = None
+        self.link_interval = 0.5
+        self.next_link_update = 0.0
+
+        # Per stage timings, logged every stats_interval when the instrument setting is on
+        if instruments is None and self.config.instrument:
+            instruments = Instruments()
+        self.instruments = instruments
+        self.display_timer = self.stage('display')
+        self.next_stats = time.monotonic() + self.config.stats_interval
+
+        self.subscribers = []
+        self.telemetry_seen = 0
+        self.mixed_seen = 0
+        self.ready = False
+
+    def start(self, connect=False, start_sub=False):
+        # Bring up everything the config asks for. Serial and telemetry connect on their own
+        # threads, so this returns as soon as commands can be sent. connect also starts the
+        # telemetry receiver and start_sub starts the sub, what the GUI buttons do by hand.
+        config = self.config
+        if self.replay_path is not None:
+            self.start_replay(self.replay_path, self.replay_speed)
+        else:
+            if config.record:
+                self.recorder = Recorder(config.recording_dir)
+            # The reader connects (and reconnects) on its own thread so a missing Arduino never blocks startup
+            if config.serial:
+                self.start_serial(config.arduino_serial_port, config.arduino_baudrate, config.arduino_timeout)
+            else:
+                logging.info('Serial port not initialized')
+        self.monitor_link(config.orin_ip_address)
+        self.get_uplink(config.orin_ip_address)
+        if connect or start_sub:
+            if self.replay is not None:
+                logging.warning('Not connecting to the Orin while replaying a recording')
+            else:
+                self.connect_orin(config.orin_ip_address)
+        if start_sub:
+            self.start_sub(config.orin_ip_address)
+        if self.config_path is not None:
+            self.watcher = ConfigWatcher(self.config_path, self.queue_config).start()
+        self.ready = True
+        return self
+
+    def stage(self, name):
+        # The named StageTimer, or None when instrumentation is off
+        return self.instruments.stage(name) if self.instruments is not None else None
+
+    @property
+    def mixer(self):
+        # The allocation matrix and lookup tables are built with the config, not per sample
+        return self.config.mixer
+
+    def queue_config(self, config):
+        # Called from the watcher thread. Only the reference is handed over, so the links are
+        # never restarted from two threads at once.
+        self.pending_config = config
+
+    def apply_config(self, config):
+        # Switch to a new StationConfig mid run, from the thread that calls poll(). The config
+        # and mixer are swapped as single references; links are never dropped, their
+        # connection settings apply on reconnect. Returns (applied, on_connect, on_restart).
+        old, self.config = self.config, config
+        changed = [f.name for f in SETTINGS if getattr(old, f.name) != getattr(config, f.name)]
+        if self.uplink is not None:
+            self.uplink.mix = config.mixer
+            self.uplink.stale_timeout = config.command_stale_timeout
+            if config.command_rate != old.command_rate:
+                self.uplink.set_rate(config.command_rate)
+        if self.link is not None and (config.heartbeat_port != old.heartbeat_port
+                                      or config.heartbeat_rate != old.heartbeat_rate):
+            self.monitor_link(self.link.address[0])
+        applied = [name for name in changed if name in LIVE_SETTINGS]
+        on_connect = [name for name in changed if name in SERIAL_SETTINGS + TELEMETRY_SETTINGS]
+        on_restart = [name for name in changed if name not in applied and name not in on_connect]
+        logging.info('Config reloaded, applied: %s', ', '.join(applied) if applied else 'nothing')
+        if on_connect:
+            logging.info('Config changes apply on the next connect: %s', ', '.join(on_connect))
+        if on_restart:
+            logging.warning('Config changes need a station restart: %s', ', '.join(on_restart))
+        return applied, on_connect, on_restart
+
+    def subscribe(self, callback):
+        # callback(values) is called from poll() with a mapping of display key to value
+        self.subscribers.append(callback)
+
+    def publish(self, values):
+        for callback in self.subscribers:
+            callback(values)
+
+    def start_serial(self, port, baudrate, timeout):
+        # Stop any previous reader before connecting to the new port
+        # Values typed into the GUI are validated like the config file
+        baudrate = integer(300, 4000000)(baudrate)
+        timeout = number(0.0, 60.0)(timeout)
+        self.stop_serial()
+        self.serial_reader = SerialReader(port, baudrate, timeout=timeout,
+                                          sample_rate=self.config.arduino_sample_rate,
+                                          state=self.controller_state)
+        if self.recorder is not None:
+            self.serial_reader.recorder = self.recorder.stream('controller', STATE_DTYPE)
+        self.serial_reader.timer = self.stage('serial')
+        self.serial_reader.start()
+        logging.info('Serial reader started on %s at %s baud', port, baudrate)
+
+    def stop_serial(self):
+        if self.serial_reader is not None:
+            self.serial_reader.stop()
+            logging.info('Serial reader stopped: %s', self.serial_reader.stats())
+            self.serial_reader = None
+
+    def connect_orin(self, host):
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        self.telemetry = TelemetryReceiver(host, self.config.telemetry_port)
+        if self.recorder is not None:
+            self.telemetry.recorder = self.recorder.stream('telemetry', TELEMETRY_DTYPE)
+        self.telemetry.timer = self.stage('telemetry')
+        self.telemetry.age_timer = self.stage('telemetry_age')
+        self.telemetry.start()
+        self.telemetry_ring = self.telemetry.ring
+        self.telemetry_seen = 0
+        logging.info('Telemetry receiver started for %s', host)
+
+    def monitor_link(self, host):
+        # (Re)start the heartbeat to host, the uplink and poll() pick up the new monitor
+        if self.link is not None:
+            self.link.stop()
+        self.link = LinkMonitor(host, self.config.heartbeat_port, rate=self.config.heartbeat_rate).start()
+        if self.uplink is not None:
+            self.uplink.link = self.link
+        logging.info('Link monitor started for %s', host)
+        return self.link
+
+    def get_uplink(self, host):
+        # (Re)create the uplink if the Orin address changed
+        if self.uplink is not None and self.uplink.address[0] != host:
+            # The old uplink may still be driving the sub, stop it before letting go of it
+            self.uplink.emergency_stop()
+            self.uplink.close()
+            self.uplink = None
+        if self.uplink is None:
+            self.uplink = CommandUplink(host, self.config.command_port, state=self.controller_state,
+                                        rate=self.config.command_rate, mix=self.mixer,
+                                        stale_timeout=self.config.command_stale_timeout)
+            if self.recorder is not None:
+                self.uplink.recorder = self.recorder.stream('commands', COMMAND_DTYPE)
+            self.uplink.link = self.link
+            self.uplink.timer = self.stage('command')
+            self.uplink.age_timer = self.stage('input_age')
+        return self.uplink
+
+    # Start sending manual mode commands to the Orin at command_rate
+    def start_sub(self, host):
+        if self.replay is not None:
+            logging.warning('Not starting the sub while replaying a recording')
+            return
+        self.get_uplink(host).start_sub()
+
+    # Sent immediately from the caller's thread, the uplink keeps sending STOP until started again.
+    # It always goes to the live uplink first, a different host (as typed into the GUI) only gets
+    # an extra one-off STOP, so a mistyped address never takes down the uplink driving the sub.
+    def emergency_stop(self, host=None):
+        if self.uplink is None:
+            self.get_uplink(host or self.config.orin_ip_address)
+        self.uplink.emergency_stop()
+        if host and host != self.uplink.address[0]:
+            extra = CommandUplink(host, self.config.command_port)
+            try:
+                extra.emergency_stop()
+            finally:
+                extra.close()
+
+    # Play a recording through the same controller state and telemetry ring the live links use
+    def start_replay(self, path, speed):
+        ring = TelemetryRing()
+        state = self.controller_state
+
+        def replay_controller(records):
+            latest = records[-1]
+            state.publish(latest['seq'], latest['axes'], latest['buttons'], latest['timestamp'])
+
+        self.telemetry_ring = ring
+        self.telemetry_seen = 0
+        self.replay = Player(Recording(path), {'controller': replay_controller, 'telemetry': ring.append}, speed=speed)
+        self.replay.start()
+        logging.info('Replaying %s at %s speed', path, '{}x'.format(speed) if speed else 'max')
+
+    # Convert the newest telemetry record into display values
+    def parse_imu_data(self, data):
+        values = {
+            'imu_roll': float(data['roll']),
+            'imu_pitch': float(data['pitch']),
+            'imu_yaw': float(data['yaw']),
+            'depth': float(data['depth']),
+            'temperature': float(data['temperature']),
+            'humidity': float(data['humidity']),
+        }
+        config = self.config
+        motors = (data['motors'] - config.motor_percent_offset) * config.motor_percent_scale
+        servos = (data['servos'] - config.servo_percent_offset) * config.servo_percent_scale
+        values.update(zip(MOTOR_KEYS, motors.tolist()))
+        values.update(zip(SERVO_KEYS, servos.tolist()))
+        return values
+
+    # Until telemetry is connected, show the motor and servo outputs we would command
+    def mixed_outputs(self):
+        config = self.config
+        sample = self.controller_state.read()[0]
+        motors, servos = config.mixer.mix(sample['axes'], sample['buttons'])
+        values = dict(zip(MOTOR_KEYS, ((motors - config.motor_percent_offset) * config.motor_percent_scale).tolist()))
+        values.update(zip(SERVO_KEYS, ((servos - config.servo_percent_offset) * config.servo_percent_scale).tolist()))
+        return values
+
+    def poll(self):
+        # Publish whatever changed since the last call, returns the values published (or None)
+        timer = self.display_timer
+        if timer is not None:
+            t0 = time.perf_counter()
+            c0 = time.thread_time()
+        # Never cleared, a new config from the watcher is always a new object
+        pending = self.pending_config
+        if pending is not self.applied_config:
+            self.applied_config = pending
+            self.apply_config(pending)
+        ring = self.telemetry_ring
+        values = None
+        if ring is None:
+            if self.controller_state.count != self.mixed_seen:
+                self.mixed_seen = self.controller_state.count
+                values = self.mixed_outputs()
+        elif ring.count != self.telemetry_seen:
+            self.telemetry_seen = ring.count
+            values = self.parse_imu_data(ring.latest(1)[0])
+        # Link quality changes slowly, a couple of updates a second is plenty
+        now = time.monotonic()
+        if self.link is not None and now >= self.next_link_update:
+            self.next_link_update = now + self.link_interval
+            values = values or {}
+            values['orin_status'] = self.link.summary()
+        if values:
+            self.publish(values)
+        if timer is not None:
+            timer.stop(t0, c0)
+            if now >= self.next_stats:
+                self.next_stats = now + self.config.stats_interval
+                logging.info('Pipeline: %s', self.instruments.summary())
+        return values
+
+    def stats(self):
+        stats = {}
+        if self.serial_reader is not None:
+            stats['serial'] = self.serial_reader.stats()
+        if self.telemetry is not None:
+            stats['telemetry'] = self.telemetry.stats()
+        if self.uplink is not None:
+            stats['uplink'] = self.uplink.stats()
+        if self.link is not None:
+            stats['link'] = self.link.stats()
+        if self.replay is not None:
+            stats['replay'] = self.replay.stats()
+        if self.watcher is not None:
+            stats['config'] = self.watcher.stats()
+        if self.instruments is not None:
+            stats['stages'] = self.instruments.stats()
+        if self.recorder is not None:
+            stats['recorder'] = self.recorder.stats()
+        return stats
+
+    def run(self, rate=30.0, stats_interval=None, duration=None):
+        # Headless main loop: poll at rate Hz and log stats every stats_interval seconds
+        if stats_interval is None:
+            stats_interval = self.config.stats_interval
+        period = 1.0 / rate
+        start = time.monotonic()
+        next_stats = start + stats_interval
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                self.poll()
+                now = time.monotonic()
+                if now >= next_stats:
+                    logging.info('Station stats: %s', self.stats())
+                    next_stats = now + stats_interval
+                if self.replay is not None and self.replay.finished.is_set():
+                    logging.info('Replay finished')
+                    break
+                time.sleep(period)
+        except KeyboardInterrupt:
+            pass
+
+    def shutdown(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.uplink is not None:
+            self.uplink.emergency_stop()
+            logging.info('Uplink stats: %s', self.uplink.stats())
+            self.uplink.close()
+            self.uplink = None
+        self.stop_serial()
+        if self.link is not None:
+            self.link.stop()
+            logging.info('Link stats: %s', self.link.stats())
+        if self.telemetry is not None:
+            self.telemetry.stop()
+            logging.info('Telemetry stats: %s', self.telemetry.stats())
+        if self.replay is not None:
+            self.replay.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+            logging.info('Recorded %s to %s', self.recorder.stats(), self.recorder.path)
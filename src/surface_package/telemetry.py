@@ -0,0 +1,239 @@
+# Telemetry channel between the Orin and the surface station
+#
+# The AUV streams batches of TELEMETRY_DTYPE records over a NumpySocket. NumpySocket.sendall
+# pickles every frame through np.savez, so batches go out as a fixed 12 byte header followed
+# by the raw record bytes, and the surface side receives them straight into a preallocated
+# ring buffer with recv_into. No Python objects are created per sample on either side.
+#
+# Batch header, little endian: magic b'TLM1', record count (u32), record size (u32)
+
+import logging
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+from numpysocket import NumpySocket
+
+NUM_MOTORS = 8
+NUM_SERVOS = 3
+
+TELEMETRY_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('seq', '<u4'),
+    ('roll', '<f4'),
+    ('pitch', '<f4'),
+    ('yaw', '<f4'),
+    ('depth', '<f4'),
+    ('temperature', '<f4'),
+    ('humidity', '<f4'),
+    ('motors', '<u2', (NUM_MOTORS,)),
+    ('servos', '<u2', (NUM_SERVOS,)),
+    ('battery_voltage', '<f4'),
+    ('battery_current', '<f4'),
+])
+
+MAGIC = b'TLM1'
+HEADER = struct.Struct('<4sII')
+MAX_BATCH = 65536
+
+
+class TelemetryRing:
+    # Fixed size ring of telemetry records. There is a single writer (the receive thread);
+    # readers copy out what they need and check count to see if anything new arrived.
+    def __init__(self, capacity=65536, dtype=TELEMETRY_DTYPE):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.bytes = memoryview(self.data.view(np.uint8))
+        self.itemsize = dtype.itemsize
+        # Total number of records ever written, the write position is count % capacity
+        self.count = 0
+
+    def write_views(self, n):
+        # Byte views for the next n records, split in two if they wrap around the end
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        size = self.itemsize
+        views = [self.bytes[start * size:(start + first) * size]]
+        if first < n:
+            views.append(self.bytes[:(n - first) * size])
+        return views
+
+    def commit(self, n):
+        self.count += n
+
+    def append(self, records):
+        n = len(records)
+        if n > self.capacity:
+            records = records[-self.capacity:]
+            self.count += n - self.capacity
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = records[:first]
+        if first < n:
+            self.data[:n - first] = records[first:]
+        self.count += n
+
+    def latest(self, n=1):
+        # Copy of the newest n records, oldest first
+        n = min(n, self.count, self.capacity)
+        end = self.count % self.capacity
+        if n <= end:
+            return self.data[end - n:end].copy()
+        return np.concatenate((self.data[self.capacity - (n - end):], self.data[:end]))
+
+    def since(self, count):
+        # Records written after the given total count (as much as the ring still holds)
+        return self.latest(self.count - count)
+
+
+class TelemetrySender:
+    # AUV side: sends batches on an already accepted NumpySocket connection
+    def __init__(self, sock):
+        self.sock = sock
+        self.batches = 0
+        self.records = 0
+
+    def send(self, records):
+        header = HEADER.pack(MAGIC, len(records), records.dtype.itemsize)
+        # socket.socket.sendmsg skips NumpySocket's np.savez framing and sends the records as is
+        payload = memoryview(np.ascontiguousarray(records)).cast('B')
+        sent = self.sock.sendmsg([header, payload])
+        total = HEADER.size + payload.nbytes
+        if sent < total:
+            data = (header + payload.tobytes())[sent:]
+            socket.socket.sendall(self.sock, data)
+        self.batches += 1
+        self.records += len(records)
+
+
+class TelemetryReceiver:
+    # Surface side: connects to the Orin and receives batches into a TelemetryRing on a
+    # background thread
+    def __init__(self, host, port, capacity=65536, timeout=1.0, latency_capacity=4096):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.ring = TelemetryRing(capacity)
+        self.sock = None
+        self.connected = False
+
+        # One latency sample (receive time minus newest record timestamp) per batch
+        self.latency = np.zeros(latency_capacity, dtype=np.float64)
+        self.latency_count = 0
+
+        self.batches = 0
+        self.errors = 0
+        # Optional recorder StreamWriter, every received batch is appended to it
+        self.recorder = None
+        # Optional instrument StageTimers: receiving a batch once its header arrived, and the
+        # age of the newest record on arrival
+        self.timer = None
+        self.age_timer = None
+
+        self._header = bytearray(HEADER.size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='telemetry_receiver', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close()
+
+    def stats(self):
+        n = min(self.latency_count, len(self.latency))
+        latency = self.latency[:n]
+        return {
+            'connected': self.connected,
+            'records': self.ring.count,
+            'batches': self.batches,
+            'errors': self.errors,
+            'latency_p50_ms': float(np.percentile(latency, 50) * 1000) if n else 0.0,
+            'latency_p99_ms': float(np.percentile(latency, 99) * 1000) if n else 0.0,
+        }
+
+    def _close(self):
+        self.connected = False
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def _recv_exact(self, view):
+        while len(view):
+            n = self.sock.recv_into(view)
+            if n == 0:
+                raise ConnectionError('telemetry connection closed')
+            view = view[n:]
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.sock is None:
+                sock = NumpySocket(socket.AF_INET, socket.SOCK_STREAM)
+                try:
+                    sock.settimeout(self.timeout)
+                    sock.connect((self.host, self.port))
+                    sock.settimeout(None)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self.sock = sock
+                    self.connected = True
+                    logging.info('Telemetry connected to %s:%s', self.host, self.port)
+                except OSError as e:
+                    sock.close()
+                    logging.debug('Telemetry could not connect to %s:%s: %s', self.host, self.port, e)
+                    self._stop.wait(self.timeout)
+                    continue
+            try:
+                self._recv_batch()
+            except (OSError, ValueError) as e:
+                if not self._stop.is_set():
+                    logging.warning('Telemetry connection lost: %s', e)
+                    self.errors += 1
+                self._close()
+
+    def _recv_batch(self):
+        header = memoryview(self._header)
+        self._recv_exact(header)
+        timer = self.timer
+        if timer is not None:
+            t0 = time.perf_counter()
+            c0 = time.thread_time()
+        magic, count, itemsize = HEADER.unpack(self._header)
+        ring = self.ring
+        if magic != MAGIC or itemsize != ring.itemsize or count > MAX_BATCH:
+            raise ValueError('bad telemetry header {!r} {} {}'.format(magic, count, itemsize))
+        if count > ring.capacity:
+            raise ValueError('telemetry batch of {} does not fit the ring'.format(count))
+        for view in ring.write_views(count):
+            self._recv_exact(view)
+        ring.commit(count)
+        if self.recorder is not None and count:
+            self.recorder.append(ring.latest(count))
+        if count:
+            newest = ring.data['timestamp'][(ring.count - 1) % ring.capacity]
+            latency = time.time() - newest
+            self.latency[self.latency_count % len(self.latency)] = latency
+            self.latency_count += 1
+            if self.age_timer is not None:
+                self.age_timer.add(latency)
+        self.batches += 1
+        if timer is not None:
+            timer.stop(t0, c0)
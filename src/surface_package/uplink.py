@@ -0,0 +1,238 @@
+# Manual mode command uplink to the Orin
+#
+# Every tick the uplink reads the newest controller sample from a LatestState and sends it
+# to the Orin as a single UDP datagram. Nothing is queued: if the joystick produced ten
+# samples since the last tick only the newest one goes out, and a late tick is skipped
+# rather than sent twice. Emergency stop and start are sent straight from the caller's
+# thread so they never wait for the next tick.
+#
+# A sample older than stale_timeout (the joystick was unplugged or the reader stalled) or
+# no sample at all is sent as centered sticks with neutral outputs. The Orin watchdog only
+# fires when packets stop, so without this the sub would keep driving on the last sample.
+#
+# Command packet, little endian, 61 bytes:
+#   magic b'CMD1', kind (u8), seq (u32), sent_time (f8, time.time()),
+#   sample_time (f8, time.monotonic() of the joystick sample),
+#   axes (6 x u16), buttons (u16), motors (8 x u16 PWM us), servos (3 x u16 PWM us)
+
+import logging
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from surface_package.serial_reader import CENTER_AXIS, LatestState
+
+MAGIC = b'CMD1'
+COMMAND = struct.Struct('<4sBIdd6HH8H3H')
+
+# The same layout as a NumPy record, used to record sent commands straight from the packet
+COMMAND_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('kind', 'u1'),
+    ('seq', '<u4'),
+    ('sent_time', '<f8'),
+    ('sample_time', '<f8'),
+    ('axes', '<u2', (6,)),
+    ('buttons', '<u2'),
+    ('motors', '<u2', (8,)),
+    ('servos', '<u2', (3,)),
+])
+
+KIND_CONTROL = 0
+KIND_STOP = 1
+KIND_START = 2
+
+NEUTRAL_PWM = 1500
+CENTER_AXES = (CENTER_AXIS,) * 6
+NUM_MOTORS = 8
+NUM_SERVOS = 3
+
+# Priority commands are repeated since a single UDP datagram can be lost
+PRIORITY_REPEATS = 3
+
+
+def unpack_command(data):
+    # Returns (kind, seq, sent_time, sample_time, axes, buttons, motors, servos) or None
+    if len(data) != COMMAND.size:
+        return None
+    values = COMMAND.unpack(data)
+    if values[0] != MAGIC:
+        return None
+    return (values[1], values[2], values[3], values[4], values[5:11], values[11],
+            values[12:20], values[20:23])
+
+
+class CommandUplink:
+    def __init__(self, host, port, state=None, rate=50.0, mix=None, stale_timeout=0.5):
+        self.address = (host, port)
+        # Where the newest controller sample comes from
+        self.state = state if state is not None else LatestState()
+        self.rate = rate
+        self.period = 1.0 / rate
+        # Optional function turning a controller sample into (motors, servos) PWM values
+        self.mix = mix
+        # Seconds after which the newest sample no longer drives the sub
+        self.stale_timeout = stale_timeout
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.packet = bytearray(COMMAND.size)
+        self.packet_record = np.frombuffer(self.packet, dtype=COMMAND_DTYPE)
+        # Optional recorder StreamWriter, every command sent is appended to it
+        self.recorder = None
+        # Optional LinkMonitor, control commands sent while the link is down are counted
+        self.link = None
+        # Optional instrument StageTimers: the whole tick, and the age of each new sample the
+        # first time it is sent
+        self.timer = None
+        self.age_timer = None
+        self.last_sample_time = 0.0
+        self.sample = np.zeros(1, dtype=self.state.slot.dtype)
+        self.neutral_motors = (NEUTRAL_PWM,) * NUM_MOTORS
+        self.neutral_servos = (NEUTRAL_PWM,) * NUM_SERVOS
+        self.seq = 0
+        self.input_stale = False
+        # Once stopped every tick sends STOP until start() is called again
+        self.stopped = False
+        self.send_lock = threading.Lock()
+
+        # Counters
+        self.sent = 0
+        self.priority_sent = 0
+        self.missed_ticks = 0
+        self.late = 0.0
+        self.max_late = 0.0
+        self.errors = 0
+        self.blind = 0
+        self.stale = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='command_uplink', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.sock.close()
+
+    def set_rate(self, rate):
+        # Takes effect from the next tick
+        self.rate = rate
+        self.period = 1.0 / rate
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'priority_sent': self.priority_sent,
+            'missed_ticks': self.missed_ticks,
+            'late_ms': self.late * 1000,
+            'max_late_ms': self.max_late * 1000,
+            'errors': self.errors,
+            'blind': self.blind,
+            'stale': self.stale,
+            'stopped': self.stopped,
+        }
+
+    def emergency_stop(self):
+        # Latch the stop and send it right away, bypassing the tick
+        self.stopped = True
+        self._send_priority(KIND_STOP)
+        logging.warning('Emergency stop sent to %s:%s', *self.address)
+
+    def start_sub(self):
+        self.stopped = False
+        self._send_priority(KIND_START)
+        self.start()
+        logging.info('Start sent to %s:%s', *self.address)
+
+    def _send_priority(self, kind):
+        for _ in range(PRIORITY_REPEATS):
+            self._send(kind, 0.0, (0,) * 6, 0, self.neutral_motors, self.neutral_servos)
+            self.priority_sent += 1
+
+    def _send(self, kind, sample_time, axes, buttons, motors, servos):
+        with self.send_lock:
+            self.seq = (self.seq + 1) & 0xFFFFFFFF
+            COMMAND.pack_into(self.packet, 0, MAGIC, kind, self.seq, time.time(), sample_time,
+                              *axes, buttons, *motors, *servos)
+            try:
+                self.sock.sendto(self.packet, self.address)
+            except OSError as e:
+                self.errors += 1
+                logging.debug('Command uplink send failed: %s', e)
+            if self.recorder is not None:
+                self.recorder.append(self.packet_record)
+
+    def tick(self):
+        # Send the newest sample (or STOP while stopped)
+        timer = self.timer
+        if timer is not None:
+            t0 = time.perf_counter()
+            c0 = time.thread_time()
+        if self.stopped:
+            self._send(KIND_STOP, 0.0, (0,) * 6, 0, self.neutral_motors, self.neutral_servos)
+            self.sent += 1
+            if timer is not None:
+                timer.stop(t0, c0)
+            return
+        sample = self.state.read(self.sample)[0]
+        sample_time = float(sample['timestamp'])
+        # A timestamp of 0 means nothing was published yet: the slot holds centered placeholder
+        # axes, not input, so it is sent as exact neutral instead of being mixed (trims would move it)
+        stale = not sample_time or time.monotonic() - sample_time > self.stale_timeout
+        if stale != self.input_stale:
+            self.input_stale = stale
+            if stale:
+                logging.warning('No controller input for %.2f s, sending neutral', self.stale_timeout)
+            else:
+                logging.info('Controller input resumed')
+        if stale:
+            axes, buttons = CENTER_AXES, 0
+            motors, servos = self.neutral_motors, self.neutral_servos
+            self.stale += 1
+        else:
+            axes = sample['axes'].tolist()
+            buttons = int(sample['buttons'])
+            if self.mix is not None:
+                motors, servos = self.mix(sample)
+            else:
+                motors, servos = self.neutral_motors, self.neutral_servos
+        self._send(KIND_CONTROL, sample_time, axes, buttons, motors, servos)
+        self.sent += 1
+        if self.link is not None and not self.link.up:
+            self.blind += 1
+        if timer is not None:
+            timer.stop(t0, c0)
+        if self.age_timer is not None and sample_time and sample_time != self.last_sample_time:
+            self.last_sample_time = sample_time
+            self.age_timer.add(time.monotonic() - sample_time)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            self.tick()
+            next_tick += self.period
+            now = time.monotonic()
+            if now > next_tick:
+                # Behind schedule: drop the missed ticks instead of bursting to catch up
+                late = now - next_tick
+                self.late = late
+                if late > self.max_late:
+                    self.max_late = late
+                missed = int(late // self.period) + 1
+                self.missed_ticks += missed
+                next_tick += missed * self.period
+            self._stop.wait(next_tick - time.monotonic())
@@ -1,8 +1,15 @@
 echo "Building docker image"
 docker build -t surface_station:latest .
-echo "Ensuring X11 forwarding is enabled"
-xhost + 10.0.0.100
-echo "Starting docker container"
-docker run --name surface_station -v /Users/user/Documents/AUV-2023/logs:/app/logs -a stdout -e DISPLAY=10.0.0.100:0 surface_station:latest
+if [ "$1" = "--headless" ]; then
+    # No display needed, stats are logged to stdout. Further arguments (--connect, --start)
+    # are passed on to the station.
+    echo "Starting docker container (headless)"
+    docker run --name surface_station --network host -v /Users/user/Documents/AUV-2023/logs:/app/logs -a stdout surface_station:latest python3 src/main.py --headless "${@:2}"
+else
+    echo "Ensuring X11 forwarding is enabled"
+    xhost + 10.0.0.100
+    echo "Starting docker container"
+    docker run --name surface_station -v /Users/user/Documents/AUV-2023/logs:/app/logs -a stdout -e DISPLAY=10.0.0.100:0 surface_station:latest
+fi
 echo "Removing docker container"
 docker rm surface_station
\ No newline at end of file
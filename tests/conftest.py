@@ -0,0 +1,16 @@
+import os
+import sys
+import time
+
+# src/main.py is run as a script, so the packages next to it are imported from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+
+def wait_for(condition, timeout=3.0, interval=0.005):
+    # Poll condition until it is true or timeout seconds passed, returns whether it became true
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return False
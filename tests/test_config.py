@@ -0,0 +1,114 @@
+import dataclasses
+import os
+
+import pytest
+
+from conftest import wait_for
+from surface_package.config import ConfigError, ConfigWatcher, load_config, parse_config
+from surface_package.station import StationCore
+
+
+def test_shipped_config_is_typed():
+    config = load_config('configs/surface_station.yml')
+    assert config.camera_1_resolution == (1280, 720)
+    assert config.arduino_timeout == 0.1
+    assert config.serial is False
+    assert config.servo_buttons == (1, 2, 3)
+    assert config.motor_percent_scale == pytest.approx(100.0 / (config.motor_speed_max - config.motor_speed_min))
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.arduino_baudrate = 9600
+    assert not hasattr(config, '__dict__')
+
+
+def test_invalid_values_are_rejected():
+    with pytest.raises(ConfigError, match='arduino_timeout'):
+        parse_config({'arduino_timeout': 'fast'})
+    with pytest.raises(ConfigError, match='motor_speed_max'):
+        parse_config({'motor_speed_min': 1800, 'motor_speed_max': 1200})
+    with pytest.raises(ConfigError, match='camera_1_resolution'):
+        parse_config({'camera_1_resolution': '(1280,)'})
+    assert parse_config({'arduino_baud_rate': 57600}).arduino_baudrate == 57600
+    for raw in ({'command_stale_timeout': float('nan')}, {'motor_trim': [0, 0, 0, 0, 0, 0, 0, float('nan')]},
+                {'telemetry_port': float('inf')}, {'imu_axis_max': float('inf')}):
+        with pytest.raises(ConfigError, match=next(iter(raw))):
+            parse_config(raw)
+
+
+def test_replace_converts_and_validates():
+    config = parse_config({})
+    assert config.replace(serial=0).serial is False
+    assert config.replace(camera_1_resolution='(640, 480)').camera_1_resolution == (640, 480)
+    with pytest.raises(ConfigError, match='command_rate'):
+        config.replace(command_rate=0)
+    with pytest.raises(ConfigError, match='no_such_setting'):
+        config.replace(no_such_setting=1)
+
+
+def write_config(path, **values):
+    with open(path, 'w') as f:
+        for key, value in values.items():
+            f.write('{}: {}\n'.format(key, value))
+
+
+def test_reload_swaps_config_and_keeps_it_on_errors(tmp_path):
+    path = str(tmp_path / 'station.yml')
+    write_config(path, orin_ip_address="'127.0.0.1'", motor_speed_max=1750)
+    core = StationCore(config_path=path).start()
+    try:
+        old = core.config
+        write_config(path, orin_ip_address="'127.0.0.1'", motor_speed_max=1900, command_rate=20,
+                     arduino_baudrate=57600, gui_fps=60)
+        assert core.watcher.check() is not None
+        # Applied by the core loop, not the watcher thread
+        assert core.config is old
+        core.poll()
+        assert core.config.motor_speed_max == 1900
+        assert core.uplink.mix is core.config.mixer is not old.mixer
+        assert core.uplink.period == pytest.approx(0.05)
+
+        # Half written or invalid files never replace the running config
+        write_config(path, orin_ip_address="'127.0.0.1'", motor_speed_max=1000)
+        assert core.watcher.check() is None
+        core.poll()
+        assert core.watcher.errors == 1 and core.config.motor_speed_max == 1900
+
+        # Every changed setting is reported as applied, applying on the next connect, or needing a restart
+        assert core.apply_config(old) == (['motor_speed_max', 'command_rate'], ['arduino_baudrate'], ['gui_fps'])
+    finally:
+        core.shutdown()
+
+
+def test_watcher_ignores_unchanged_file(tmp_path):
+    path = str(tmp_path / 'station.yml')
+    write_config(path, gui_fps=30)
+    changes = []
+    watcher = ConfigWatcher(path, changes.append)
+    assert watcher.check() is None
+    write_config(path, gui_fps=60)
+    os.utime(path, ns=(1, 1))
+    assert watcher.check().gui_fps == 60.0
+    assert watcher.check() is None
+    assert len(changes) == 1
+
+
+def test_watcher_survives_unexpected_errors(tmp_path):
+    path = str(tmp_path / 'station.yml')
+    write_config(path, gui_fps=30)
+    changes = []
+
+    def on_change(config):
+        changes.append(config)
+        if len(changes) == 1:
+            raise RuntimeError('bug in the reload handler')
+
+    watcher = ConfigWatcher(path, on_change, interval=0.01).start()
+    try:
+        write_config(path, gui_fps=60)
+        os.utime(path, ns=(1, 1))
+        assert wait_for(lambda: watcher.errors == 1)
+        write_config(path, gui_fps=90)
+        os.utime(path, ns=(2, 2))
+        assert wait_for(lambda: len(changes) == 2)
+        assert changes[-1].gui_fps == 90.0
+    finally:
+        watcher.stop()
@@ -0,0 +1,28 @@
+import time
+
+from surface_package.instrument import HISTOGRAM_EDGES_US, Instruments, StageTimer
+
+
+def test_stage_timer_percentiles_and_histogram():
+    timer = StageTimer('decode', capacity=100)
+    for us in range(1, 201):
+        timer.add(us * 1e-6)
+    stats = timer.stats()
+    # Only the newest 100 samples (101 .. 200 us) are kept for percentiles
+    assert stats['count'] == 200
+    assert 149.0 < stats['p50_us'] < 152.0
+    assert abs(stats['max_us'] - 200.0) < 1e-6
+    counts = timer.histogram()
+    assert len(counts) == len(HISTOGRAM_EDGES_US) - 1 and counts.sum() == 100
+
+
+def test_instruments_summary_line():
+    instruments = Instruments()
+    timer = instruments.stage('serial')
+    assert instruments.stage('serial') is timer
+    t0 = time.perf_counter()
+    c0 = time.thread_time()
+    timer.stop(t0, c0)
+    instruments.stage('idle')
+    assert instruments.summary().startswith('serial ')
+    assert instruments.stats()['idle'] == {'count': 0}
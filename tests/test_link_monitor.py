@@ -0,0 +1,47 @@
+import socket
+import time
+
+from conftest import wait_for
+from surface_package.link_monitor import HEARTBEAT, LinkMonitor
+from surface_package.orin_sim import OrinSimulator
+
+
+def test_monitor_measures_round_trip():
+    with OrinSimulator() as orin:
+        monitor = LinkMonitor('127.0.0.1', orin.heartbeat_port, rate=100.0, timeout=0.2).start()
+        try:
+            assert wait_for(lambda: monitor.received >= 20)
+            stats = monitor.stats()
+            assert stats['up']
+            assert 0.0 < stats['rtt_ms'] < 50.0
+            assert stats['loss'] == 0.0
+            assert 'loss' in monitor.summary()
+        finally:
+            monitor.stop()
+
+
+def test_monitor_counts_loss():
+    with OrinSimulator(echo_drop_every=4) as orin:
+        monitor = LinkMonitor('127.0.0.1', orin.heartbeat_port, rate=200.0, window=200, timeout=0.05).start()
+        try:
+            assert wait_for(lambda: monitor.sent >= 200)
+            time.sleep(0.1)
+            assert abs(monitor.stats()['loss'] - 0.25) < 0.05
+        finally:
+            monitor.stop()
+
+
+def test_monitor_reports_down_without_echo():
+    # Bound but never answered, like an Orin that is powered but not running the stack
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(('127.0.0.1', 0))
+    monitor = LinkMonitor('127.0.0.1', silent.getsockname()[1], rate=100.0, timeout=0.05).start()
+    try:
+        assert wait_for(lambda: monitor.sent >= 20)
+        stats = monitor.stats()
+        assert not stats['up']
+        assert stats['loss'] == 1.0
+        assert len(silent.recv(64)) == HEARTBEAT.size
+    finally:
+        monitor.stop()
+        silent.close()
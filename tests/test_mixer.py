@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from movement_package.mixer import Mixer
+from surface_package.config import parse_config
+
+CENTER = [512] * 6
+
+
+def test_centered_sticks_are_neutral():
+    mixer = Mixer(deadband=0.05)
+    motors, servos = mixer.mix(CENTER, 0)
+    assert motors.tolist() == [1500] * 8
+    assert servos.tolist() == [1000] * 3
+
+
+def test_full_surge_drives_horizontal_thrusters_only():
+    mixer = Mixer(deadband=0.01)
+    axes = list(CENTER)
+    axes[1] = 1023
+    motors = mixer.motors(axes)
+    assert motors[:4].tolist() == [1750, 1750, 1250, 1250]
+    assert motors[4:].tolist() == [1500] * 4
+
+
+def test_saturation_keeps_direction():
+    mixer = Mixer(deadband=0.01)
+    # Full surge plus full yaw asks thruster 1 for 2x, everything is scaled by half
+    axes = list(CENTER)
+    axes[1] = 1023
+    axes[5] = 1023
+    thrust = mixer.thrust(axes)
+    assert np.max(np.abs(thrust)) == pytest.approx(1.0)
+    assert thrust[0] == pytest.approx(1.0)
+    assert thrust[1] == pytest.approx(0.0)
+
+
+def test_batch_matches_single_samples():
+    mixer = Mixer(deadband=0.1, expo=0.4, trims=[10, 0, 0, 0, 0, 0, 0, -10])
+    rng = np.random.default_rng(1)
+    axes = rng.integers(0, 1024, size=(50, 6))
+    buttons = rng.integers(0, 1024, size=50)
+    motors, servos = mixer.mix(axes, buttons)
+    assert motors.shape == (50, 8) and servos.shape == (50, 3)
+    for i in (0, 17, 49):
+        single_motors, single_servos = mixer.mix(axes[i], buttons[i])
+        assert np.array_equal(single_motors, motors[i])
+        assert np.array_equal(single_servos, servos[i])
+    assert motors.min() >= 1250 and motors.max() <= 1750
+
+
+def test_deadband_and_expo_shape_axes():
+    mixer = Mixer(deadband=0.5, expo=1.0)
+    shaped = mixer.shape_axes([511.5 + 0.25 * 511.5, 511.5 - 0.75 * 511.5, 1023, 0, 511.5, 511.5])
+    assert shaped[0] == 0.0
+    assert shaped[1] == pytest.approx(-0.125)
+    assert shaped[2] == pytest.approx(1.0)
+    assert shaped[3] == pytest.approx(-1.0)
+
+
+def test_from_config_reads_limits_and_servo_buttons():
+    config = {'motor_speed_min': 1100, 'motor_speed_max': 1900, 'servo_1_min': 1200, 'servo_1_max': 1800,
+              'servo_2_min': 1000, 'servo_2_max': 2000, 'mixer_deadband': 0.01}
+    mixer = Mixer.from_config(parse_config(config))
+    sample = np.zeros(1, dtype=[('axes', '<u2', (6,)), ('buttons', '<u2')])[0]
+    sample['axes'] = CENTER
+    sample['buttons'] = 0b001
+    motors, servos = mixer(sample)
+    assert motors == [1500] * 8
+    assert servos == [1800, 1000, 1000]
+    with pytest.raises(ValueError):
+        Mixer(matrix=np.zeros((8, 5)))
+    with pytest.raises(ValueError, match='servo buttons'):
+        Mixer(servo_buttons=(0, 2, 3))
+    with pytest.raises(ValueError, match='servo_buttons'):
+        parse_config({'servo_buttons': [1, 2, 11]})
@@ -0,0 +1,43 @@
+import numpy as np
+
+from surface_package.orin_sim import make_telemetry
+from surface_package.plots import PlotBuffer, RollingPlot, decimate_minmax
+from surface_package.telemetry import TelemetryRing
+
+
+def test_buffer_latest_is_a_view_across_wraparound():
+    buffer = PlotBuffer(100, 2)
+    for start in range(0, 250, 30):
+        t = np.arange(start, start + 30, dtype=np.float64)
+        buffer.append(t, np.vstack((t, -t)))
+    t, y = buffer.latest(100)
+    assert t.tolist() == list(range(170, 270))
+    assert y[1].tolist() == [-v for v in range(170, 270)]
+    assert np.shares_memory(t, buffer.t)
+    t, y = buffer.window(10.0)
+    assert t[0] == 259.0 and len(y[0]) == 11
+
+
+def test_decimation_keeps_extremes():
+    t = np.arange(60000) / 1000.0
+    y = np.zeros((1, 60000), dtype=np.float32)
+    y[0, 12345] = 5.0
+    y[0, 40000] = -3.0
+    td, yd = decimate_minmax(t, y, 300)
+    assert yd.shape == (1, 600) and len(td) == 600
+    assert yd.max() == 5.0 and yd.min() == -3.0
+
+
+def test_plot_blits_after_first_draw():
+    ring = TelemetryRing(4096)
+    plot = RollingPlot(window=5.0, rate=100.0, buckets=50)
+    for i in range(10):
+        ring.append(make_telemetry(i * 100, 100, i, 100.0))
+        plot.feed(ring)
+        plot.draw()
+    stats = plot.stats()
+    assert stats['samples'] == 1000
+    assert stats['frames'] == 10 and stats['full_redraws'] == 1
+    assert stats['points'] == 100
+    x, y = plot.lines[0][0].get_data()
+    assert x[-1] == 0.0 and x[0] >= -5.0
@@ -0,0 +1,73 @@
+import numpy as np
+
+from surface_package.controller import new_controller, apply_sample
+from surface_package.protocol import (FRAME_SIZE, SAMPLE_DTYPE, FrameDecoder, crc16, crc16_rows,
+                                      encode_frame, encode_frames, encode_legacy_line, parse_legacy_line)
+
+
+def make_samples(n):
+    samples = np.zeros(n, dtype=SAMPLE_DTYPE)
+    samples['seq'] = np.arange(n) % 256
+    samples['axes'] = (np.arange(n * 6).reshape(n, 6) * 7) % 1024
+    samples['buttons'] = np.arange(n) % 1024
+    return samples
+
+
+def test_crc_matches_reference():
+    # CRC-16/MCRF4XX check value
+    assert crc16(b'123456789') == 0x6F91
+    rows = np.frombuffer(b'123456789' * 3, dtype=np.uint8).reshape(3, 9)
+    assert crc16_rows(rows).tolist() == [0x6F91] * 3
+
+
+def test_encode_frame_matches_vectorized():
+    samples = make_samples(3)
+    single = b''.join(encode_frame(int(s['seq']), s['axes'].tolist(), int(s['buttons'])) for s in samples)
+    assert single == encode_frames(samples)
+    assert len(single) == 3 * FRAME_SIZE
+
+
+def test_round_trip_in_small_chunks():
+    samples = make_samples(300)
+    data = encode_frames(samples)
+    decoder = FrameDecoder()
+    out = [decoder.feed(data[i:i + 7]) for i in range(0, len(data), 7)]
+    out = np.concatenate(out)
+    assert decoder.mode == 'binary'
+    assert np.array_equal(out, samples)
+    assert decoder.lost == 0
+    assert decoder.skipped_bytes == 0
+
+
+def test_resync_after_corruption():
+    samples = make_samples(20)
+    data = bytearray(encode_frames(samples))
+    # Flip a byte in frame 5 and insert garbage before frame 10
+    data[5 * FRAME_SIZE + 6] ^= 0xFF
+    data[10 * FRAME_SIZE:10 * FRAME_SIZE] = b'\xa5\x5a\x00garbage'
+    decoder = FrameDecoder()
+    out = decoder.feed(bytes(data))
+    expected = np.delete(samples, 5)
+    assert np.array_equal(out, expected)
+    assert decoder.crc_errors >= 1
+    assert decoder.lost == 1
+
+
+def test_legacy_lines_still_decode():
+    line = encode_legacy_line([1, 2, 3, 4, 5, 1023], 0b1000000001)
+    assert parse_legacy_line(line) == ([1, 2, 3, 4, 5, 1023], 0b1000000001)
+    decoder = FrameDecoder()
+    out = decoder.feed(line + line[:10])
+    out = np.concatenate([out, decoder.feed(line[10:])])
+    assert decoder.mode == 'legacy'
+    assert len(out) == 2
+    assert out['axes'][1].tolist() == [1, 2, 3, 4, 5, 1023]
+
+
+def test_apply_sample_sets_controller():
+    controller = new_controller()
+    apply_sample(controller, [10, 20, 30, 40, 50, 60], 0b101)
+    assert controller.left.y_axis == 20.0
+    assert controller.right.z_axis == 60.0
+    assert controller.buttons['button1'] and controller.buttons['button3']
+    assert not controller.buttons['button2']
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+
+from surface_package.orin_sim import make_telemetry
+from surface_package.recorder import Player, Recorder, Recording
+from surface_package.serial_reader import STATE_DTYPE
+
+
+def record_telemetry(tmp_path, n, segment_records=100):
+    recorder = Recorder(str(tmp_path), name='dive', segment_records=segment_records)
+    writer = recorder.stream('telemetry', make_telemetry(0, 1, 0.0, 1.0).dtype)
+    # Batches of 10 records one second apart, stamped on arrival of the newest record
+    for i in range(0, n, 10):
+        writer.append(make_telemetry(i, 10, float(i), 1.0), t=1000.0 + i + 9)
+    return recorder
+
+
+def test_round_trip_across_segments(tmp_path):
+    recorder = record_telemetry(tmp_path, 1000)
+    recorder.close()
+    stream = Recording(recorder.path)['telemetry']
+    assert len(stream) == 1000
+    assert len([f for f in os.listdir(recorder.path) if f.endswith('.npy')]) == 10
+    records = stream.read(95, 215)
+    assert records['data']['seq'].tolist() == list(range(95, 215))
+    # Every record keeps its own time, not the arrival time of its batch
+    assert stream.time_range() == (1000.0, 1999.0)
+    assert records['t'].tolist() == [1000.0 + i for i in range(95, 215)]
+
+
+def test_seek_uses_time(tmp_path):
+    recorder = record_telemetry(tmp_path, 1000)
+    recorder.close()
+    stream = Recording(recorder.path)['telemetry']
+    assert stream.seek(0.0) == 0
+    assert stream.seek(1500.0) == 500
+    assert stream.seek(1505.0) == 505
+    assert stream.seek(1505.5) == 506
+    assert stream.seek(5000.0) == 1000
+
+
+def test_batch_times_never_go_back(tmp_path):
+    recorder = Recorder(str(tmp_path), name='jitter')
+    writer = recorder.stream('telemetry', make_telemetry(0, 1, 0.0, 1.0).dtype)
+    writer.append(make_telemetry(0, 10, 0.0, 100.0), t=50.0)
+    # Arrived early relative to its own spacing, the overlap is clamped to the previous record
+    writer.append(make_telemetry(10, 10, 0.1, 100.0), t=50.05)
+    recorder.close()
+    t = Recording(recorder.path)['telemetry'].read(0, 20)['t']
+    assert t[9] == 50.0 and t[-1] == 50.05
+    assert np.all(np.diff(t) >= 0)
+
+
+def test_clock_steps_back_keep_times_sorted(tmp_path):
+    recorder = Recorder(str(tmp_path), name='clock')
+    writer = recorder.stream('controller', STATE_DTYPE)
+    sample = np.zeros(1, dtype=STATE_DTYPE)
+    for t in (100.0, 101.0, 102.0, 99.5, 100.5, 103.0):
+        writer.append(sample, t=t)
+    recorder.close()
+    stream = Recording(recorder.path)['controller']
+    assert stream.read(0, 6)['t'].tolist() == [100.0, 101.0, 102.0, 102.0, 102.0, 103.0]
+    assert stream.seek(102.0) == 2
+
+
+def test_unclosed_recording_is_recovered(tmp_path):
+    recorder = record_telemetry(tmp_path, 250)
+    # No close(): the manifest is missing, as after a crash
+    for writer in recorder.streams.values():
+        writer.memmap.flush()
+        writer.index.flush()
+    stream = Recording(recorder.path)['telemetry']
+    assert len(stream) == 250
+    assert stream.read(240, 250)['data']['seq'].tolist() == list(range(240, 250))
+
+
+def test_player_replays_everything_in_order(tmp_path):
+    recorder = Recorder(str(tmp_path), name='mixed')
+    controller = recorder.stream('controller', STATE_DTYPE)
+    telemetry = recorder.stream('telemetry', make_telemetry(0, 1, 0.0, 1.0).dtype)
+    sample = np.zeros(1, dtype=STATE_DTYPE)
+    for i in range(300):
+        sample['seq'] = i % 256
+        controller.append(sample, t=100.0 + i * 0.01)
+        telemetry.append(make_telemetry(i, 1, 0.0, 1.0), t=100.0 + i * 0.01)
+    recorder.close()
+
+    received = {'controller': [], 'telemetry': []}
+    sinks = {name: received[name].append for name in received}
+    player = Player(Recording(recorder.path), sinks, speed=None)
+    player.run()
+    assert player.played == {'controller': 300, 'telemetry': 300}
+    assert np.concatenate(received['telemetry'])['seq'].tolist() == list(range(300))
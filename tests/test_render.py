@@ -0,0 +1,44 @@
+from surface_package.render import RenderScheduler, format_float, format_percent
+
+
+class FakeElement:
+    def __init__(self):
+        self.calls = []
+
+    def update(self, **kwargs):
+        self.calls.append(kwargs)
+
+
+def make_scheduler(fps=30.0):
+    window = {'depth': FakeElement(), 'motor1_progress': FakeElement()}
+    scheduler = RenderScheduler(window, fps=fps)
+    scheduler.register('depth', format_float)
+    scheduler.register('motor1_progress', format_percent, progress=True)
+    return window, scheduler
+
+
+def test_flush_coalesces_and_rate_limits():
+    window, scheduler = make_scheduler(fps=10.0)
+    for i in range(100):
+        scheduler.update('depth', i * 0.5)
+    assert scheduler.flush(now=1.0) == 1
+    assert window['depth'].calls == [{'value': '49.5'}]
+    scheduler.update('depth', 1.0)
+    # Too soon for the next frame, the value stays queued
+    assert scheduler.flush(now=1.05) == 0
+    assert scheduler.flush(now=1.1) == 1
+    stats = scheduler.stats()
+    assert stats['coalesced'] == 99
+    assert stats['frames'] == 2
+    assert scheduler.timeout_ms == 100
+
+
+def test_flush_skips_unchanged_formatted_values():
+    window, scheduler = make_scheduler()
+    scheduler.update_many({'depth': 1.01, 'motor1_progress': 40.2})
+    scheduler.flush(now=1.0)
+    scheduler.update_many({'depth': 1.04, 'motor1_progress': 39.9})
+    assert scheduler.flush(now=2.0) == 0
+    assert window['depth'].calls == [{'value': '1.0'}]
+    assert window['motor1_progress'].calls == [{'current_count': 40}]
+    assert scheduler.stats()['skipped'] == 2
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from conftest import wait_for
+from surface_package.arduino_sim import FakeArduino
+from surface_package.controller import new_controller
+from surface_package.serial_reader import LatestState, SerialReader
+
+
+@pytest.fixture
+def arduino(tmp_path):
+    fake = FakeArduino(str(tmp_path / 'ttyACM0'))
+    yield fake
+    fake.unplug()
+
+
+def test_latest_state_round_trip():
+    state = LatestState()
+    # Nothing published yet reads as centered sticks, not full deflection
+    assert state.read()['axes'][0].tolist() == [512] * 6 and state.read()['timestamp'][0] == 0
+    state.publish(7, [1, 2, 3, 4, 5, 6], 0b11, 12.5)
+    out = state.read()
+    assert out['seq'][0] == 7
+    assert out['axes'][0].tolist() == [1, 2, 3, 4, 5, 6]
+    controller = new_controller()
+    assert state.read_controller(controller) == 12.5
+    assert controller.buttons['button2'] and not controller.buttons['button3']
+    assert state.count == 1
+
+
+def test_reader_publishes_newest_sample(arduino):
+    reader = SerialReader(arduino.link, 115200, timeout=0.05, reconnect_interval=0.05)
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.connected)
+        arduino.send([100, 200, 300, 400, 500, 600], 0, count=50)
+        arduino.send([1, 2, 3, 4, 5, 6], 0b1, count=1)
+        assert wait_for(lambda: reader.decoder.frames == 51)
+        sample = reader.state.read()[0]
+        assert sample['axes'].tolist() == [1, 2, 3, 4, 5, 6]
+        stats = reader.stats()
+        assert stats['lost'] == 0
+        assert stats['dropped'] == 51 - stats['samples']
+    finally:
+        reader.stop()
+
+
+def test_reader_reconnects_after_unplug(arduino):
+    reader = SerialReader(arduino.link, 115200, timeout=0.05, reconnect_interval=0.05)
+    reader.start()
+    try:
+        assert wait_for(lambda: reader.connected)
+        arduino.send([1, 1, 1, 1, 1, 1], 0)
+        assert wait_for(lambda: reader.state.count == 1)
+        arduino.unplug()
+        assert wait_for(lambda: not reader.connected)
+        arduino.plug()
+        assert wait_for(lambda: reader.connected and reader.reconnects == 1)
+        arduino.send([9, 9, 9, 9, 9, 9], 0)
+        assert wait_for(lambda: reader.state.read()['axes'][0][0] == 9)
+    finally:
+        reader.stop()
+
+
+def test_reader_flushes_backlog(arduino):
+    reader = SerialReader(arduino.link, 115200, timeout=0.05, max_backlog=64)
+    # Queue up a backlog before the reader starts draining
+    reader._open()
+    arduino.send([5, 5, 5, 5, 5, 5], 0, count=40)
+    arduino.send([7, 7, 7, 7, 7, 7], 0, count=1)
+    assert wait_for(lambda: reader.ser.in_waiting > 64)
+    while reader.ser.in_waiting:
+        reader._read_once()
+    reader._close()
+    assert reader.overruns == 1
+    assert reader.state.read()['axes'][0][0] == 7
+
+
+def test_zero_timeout_still_blocks_for_a_poll_period(arduino):
+    # A non blocking port would make the reader thread spin while nothing arrives
+    reader = SerialReader(arduino.link, 115200, timeout=0, sample_rate=100.0)
+    reader._open()
+    try:
+        assert reader.ser.timeout == 0.01
+        start = time.monotonic()
+        reader._read_once()
+        assert time.monotonic() - start >= 0.005
+    finally:
+        reader._close()
@@ -0,0 +1,155 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import wait_for
+from surface_package.arduino_sim import FakeArduino
+from surface_package.orin_sim import OrinSimulator
+from surface_package.config import load_config
+from surface_package.station import StationCore
+from surface_package.uplink import KIND_CONTROL, KIND_STOP
+
+
+class Joystick:
+    # Streams one stick position from the fake Arduino at 100 Hz, like AUV.ino does
+    def __init__(self, arduino, axes, buttons=0):
+        self.arduino = arduino
+        self.axes = axes
+        self.buttons = buttons
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(0.01):
+            self.arduino.send(self.axes, self.buttons)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+@pytest.fixture
+def config():
+    return load_config('configs/surface_station.yml').replace(orin_ip_address='127.0.0.1', serial=False,
+                                                              record=False, command_rate=100.0)
+
+
+# Other tests import matplotlib, so the imports are checked in a fresh interpreter
+STARTUP_SCRIPT = '''
+import sys
+sys.path.insert(0, 'src')
+from surface_package.config import load_config
+from surface_package.station import StationCore
+config = load_config('configs/surface_station.yml').replace(serial=False, record=False, orin_ip_address='127.0.0.1')
+core = StationCore(config=config).start()
+print(core.ready, core.uplink is not None, *(name in sys.modules for name in ('PySimpleGUI', 'matplotlib', 'tkinter')))
+core.shutdown()
+'''
+
+
+def test_station_starts_without_gui():
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+    ready, uplink, gui, matplotlib, tkinter = result.stdout.split()
+    assert ready == uplink == 'True'
+    assert gui == matplotlib == tkinter == 'False'
+
+
+def test_headless_station_connects_and_starts(config):
+    with OrinSimulator(watchdog_timeout=1.0) as orin:
+        config = config.replace(command_port=orin.command_port, telemetry_port=orin.telemetry_port,
+                                heartbeat_port=orin.heartbeat_port)
+        core = StationCore(config=config).start(connect=True, start_sub=True)
+        published = []
+        core.subscribe(published.append)
+        try:
+            core.run(rate=30.0, duration=0.5)
+            assert core.stats()['telemetry']['records'] > 0
+            assert any('imu_roll' in values for values in published)
+            assert orin.armed and orin.commands > 5
+        finally:
+            core.shutdown()
+
+
+def test_emergency_stop_reaches_the_live_uplink(config):
+    with OrinSimulator(watchdog_timeout=5.0) as orin:
+        config = config.replace(command_port=orin.command_port, heartbeat_port=orin.heartbeat_port)
+        core = StationCore(config=config).start()
+        try:
+            core.start_sub('127.0.0.1')
+            live = core.uplink
+            assert wait_for(lambda: orin.armed)
+            # The address typed into the GUI differs from the one the uplink was made for
+            core.emergency_stop('localhost')
+            assert wait_for(lambda: not orin.armed, timeout=0.5)
+            assert core.uplink is live and live.stopped
+        finally:
+            core.shutdown()
+
+
+def test_station_drives_orin_from_arduino(config, tmp_path):
+    arduino = FakeArduino(str(tmp_path / 'ttyACM0'))
+    with OrinSimulator(watchdog_timeout=1.0) as orin:
+        config = config.replace(serial=True, arduino_serial_port=arduino.link, command_port=orin.command_port,
+                                telemetry_port=orin.telemetry_port, heartbeat_port=orin.heartbeat_port)
+        core = StationCore(config=config).start()
+        published = []
+        core.subscribe(published.append)
+        joystick = None
+        try:
+            assert wait_for(lambda: core.serial_reader.connected)
+            joystick = Joystick(arduino, [512, 1023, 512, 512, 512, 512])
+            assert wait_for(lambda: 'motor1_progress' in (core.poll() or {}))
+            assert published[-1]['motor1_progress'] > 50.0
+
+            core.start_sub('127.0.0.1')
+            assert wait_for(lambda: orin.armed and orin.commands > 5)
+            control = orin.commands_logged()
+            control = control[control['kind'] == KIND_CONTROL]
+            assert control['axes'][-1].tolist() == [512, 1023, 512, 512, 512, 512]
+
+            assert wait_for(lambda: core.link.up)
+            core.connect_orin('127.0.0.1')
+            assert wait_for(lambda: 'imu_roll' in (core.poll() or {}))
+            stages = core.stats()['stages']
+            assert stages['serial']['count'] and stages['command']['count'] and stages['display']['count']
+            assert wait_for(lambda: core.instruments.stages['telemetry'].count > 0)
+        finally:
+            if joystick is not None:
+                joystick.stop()
+            core.shutdown()
+            arduino.unplug()
+        assert orin.commands_logged()['kind'][-1] == KIND_STOP
+
+
+def test_unplugged_joystick_returns_orin_to_neutral(config, tmp_path):
+    arduino = FakeArduino(str(tmp_path / 'ttyACM0'))
+    with OrinSimulator(watchdog_timeout=5.0) as orin:
+        config = config.replace(serial=True, arduino_serial_port=arduino.link, command_port=orin.command_port,
+                                heartbeat_port=orin.heartbeat_port, command_stale_timeout=0.2)
+        core = StationCore(config=config).start()
+        joystick = None
+        try:
+            # Start before the first frame arrives: nothing published yet is sent as neutral
+            core.start_sub('127.0.0.1')
+            assert wait_for(lambda: orin.armed and orin.commands > 5)
+            assert orin.motors.tolist() == [1500] * 8
+
+            assert wait_for(lambda: core.serial_reader.connected)
+            joystick = Joystick(arduino, [512, 1023, 512, 512, 512, 512])
+            assert wait_for(lambda: orin.motors[:4].tolist() == [1750, 1750, 1250, 1250])
+
+            joystick.stop()
+            arduino.unplug()
+            unplugged = time.monotonic()
+            assert wait_for(lambda: orin.motors.tolist() == [1500] * 8, timeout=1.0)
+            assert time.monotonic() - unplugged < 1.0
+            assert orin.armed and orin.watchdog_trips == 0
+        finally:
+            if joystick is not None:
+                joystick.stop()
+            core.shutdown()
+            arduino.unplug()
@@ -0,0 +1,121 @@
+import time
+
+from conftest import wait_for
+from surface_package.orin_sim import OrinSimulator
+from surface_package.serial_reader import LatestState
+from surface_package.uplink import COMMAND, KIND_CONTROL, KIND_STOP, PRIORITY_REPEATS, CommandUplink, unpack_command
+
+
+def fixed_mix(sample):
+    return (1600,) * 8, (1400,) * 3
+
+
+def test_unpack_rejects_bad_packets():
+    assert unpack_command(b'\x00' * COMMAND.size) is None
+    assert unpack_command(b'CMD1') is None
+
+
+def test_tick_sends_only_newest_sample():
+    with OrinSimulator(watchdog_timeout=1.0) as orin:
+        state = LatestState()
+        uplink = CommandUplink('127.0.0.1', orin.command_port, state=state)
+        try:
+            for i in range(10):
+                state.publish(i, [i] * 6, 0, time.monotonic())
+            uplink.tick()
+            assert wait_for(lambda: orin.commands == 1)
+            entry = orin.commands_logged()[0]
+            assert entry['kind'] == KIND_CONTROL
+            assert entry['axes'].tolist() == [9] * 6
+        finally:
+            uplink.close()
+
+
+def test_stale_or_missing_input_sends_neutral():
+    with OrinSimulator(watchdog_timeout=5.0) as orin:
+        state = LatestState()
+        uplink = CommandUplink('127.0.0.1', orin.command_port, state=state, mix=fixed_mix, stale_timeout=0.1)
+        try:
+            # Nothing published yet: neutral outputs, not the mix of the placeholder sample
+            uplink.start_sub()
+            assert wait_for(lambda: orin.commands > PRIORITY_REPEATS + 2)
+            assert orin.motors.tolist() == [1500] * 8
+            control = orin.commands_logged()
+            control = control[control['kind'] == KIND_CONTROL]
+            assert control['axes'][-1].tolist() == [512] * 6
+
+            state.publish(0, [512] * 6, 0, time.monotonic())
+            assert wait_for(lambda: orin.motors[0] == 1600)
+            # The joystick goes quiet, the uplink keeps sending but at neutral
+            assert wait_for(lambda: orin.motors[0] == 1500, timeout=1.0)
+            assert orin.armed and orin.watchdog_trips == 0
+            assert uplink.stats()['stale'] > 0
+        finally:
+            uplink.close()
+
+
+def test_new_uplink_session_is_accepted():
+    with OrinSimulator(watchdog_timeout=5.0) as orin:
+        state = LatestState()
+        state.publish(0, [512] * 6, 0, time.monotonic())
+        first = CommandUplink('127.0.0.1', orin.command_port, state=state, rate=200.0, mix=fixed_mix,
+                              stale_timeout=60.0)
+        try:
+            first.start_sub()
+            assert wait_for(lambda: orin.commands > 30 and orin.motors[0] == 1600)
+            first.emergency_stop()
+            assert wait_for(lambda: not orin.armed)
+        finally:
+            first.close()
+
+        # A restarted station counts from seq 1 again, behind everything the first one sent
+        second = CommandUplink('127.0.0.1', orin.command_port, state=state, rate=200.0, mix=fixed_mix,
+                               stale_timeout=60.0)
+        try:
+            second.start_sub()
+            assert wait_for(lambda: orin.armed and orin.motors[0] == 1600)
+            second.emergency_stop()
+            assert wait_for(lambda: not orin.armed)
+            assert orin.motors.tolist() == [1500] * 8
+            assert orin.stale == 0
+        finally:
+            second.close()
+
+
+def test_emergency_stop_bypasses_tick():
+    with OrinSimulator(watchdog_timeout=5.0) as orin:
+        # A slow tick so anything that arrives quickly came through the priority path
+        state = LatestState()
+        state.publish(0, [512] * 6, 0, time.monotonic())
+        uplink = CommandUplink('127.0.0.1', orin.command_port, state=state, rate=0.5, mix=fixed_mix,
+                               stale_timeout=60.0)
+        try:
+            uplink.start_sub()
+            assert wait_for(lambda: orin.armed and orin.motors[0] == 1600)
+            sent = time.monotonic()
+            uplink.emergency_stop()
+            assert wait_for(lambda: not orin.armed, timeout=0.5)
+            assert time.monotonic() - sent < 0.5
+            assert orin.motors.tolist() == [1500] * 8
+            # The stop is latched on every following tick too
+            uplink.tick()
+            assert wait_for(lambda: orin.commands_logged()['kind'][-1] == KIND_STOP)
+        finally:
+            uplink.close()
+
+
+def test_watchdog_zeroes_motors_when_commands_stop():
+    with OrinSimulator(watchdog_timeout=0.1) as orin:
+        state = LatestState()
+        state.publish(0, [512] * 6, 0, time.monotonic())
+        uplink = CommandUplink('127.0.0.1', orin.command_port, state=state, rate=100.0, mix=fixed_mix,
+                               stale_timeout=60.0)
+        try:
+            uplink.start_sub()
+            assert wait_for(lambda: orin.motors[0] == 1600)
+            uplink.stop()
+            assert wait_for(lambda: orin.motors[0] == 1500, timeout=1.0)
+            assert orin.watchdog_trips == 1
+            assert orin.servos.tolist() == [1500] * 3
+        finally:
+            uplink.close()